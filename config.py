@@ -22,3 +22,44 @@ INFRACTIONS_FILE = "infractions.json"
 TRUST_FILE = "trust.json"
 REPORT_LOG_FILE = "report_log.json"
 NICK_TIMESTAMP_FILE = "nick_timestamps.json"
+
+# 💾 Как часто (в секундах) изменения сбрасываются на диск
+SAVE_INTERVAL = float(os.getenv("SAVE_INTERVAL", "2"))
+
+# 📜 Журнал истории матчей: каталог сегментов и число матчей в одном сегменте
+MATCH_LOG_DIR = "match_log"
+MATCH_SEGMENT_RECORDS = 5000
+
+# 🗄️ Хранилище: "json" (файлы целиком, для небольших инсталляций) или "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+SQLITE_FILE = "inexbot.db"
+SQLITE_CACHE_SIZE = 5000  # сколько записей каждой таблицы держать в памяти
+
+# ⚖️ Матчмейкинг: "quality" — самые близкие по ELO матчи, "throughput" — максимум матчей за проход
+MATCHMAKING_STRATEGY = os.getenv("MATCHMAKING_STRATEGY", "quality")
+
+# ⏱️ Задержка (сек) перед проходом матчмейкинга после события очереди — склеивает всплески входов
+MATCHMAKING_DEBOUNCE = 0.1
+# 🔁 Через сколько секунд повторить проход, если подходящий матч не удалось создать
+MATCHMAKING_RETRY = 30
+
+# 📤 Исходящие сообщения: одновременных запросов, лимит на весь бот (в сек) и на один чат
+OUTBOX_CONCURRENCY = 8
+OUTBOX_GLOBAL_RATE = 30
+OUTBOX_CHAT_RATE = 1
+OUTBOX_CHAT_BURST = 3  # короткий всплеск в один чат (например, несколько сообщений о матче)
+
+# 📜 Сколько последних матчей каждого игрока держать в индексе для /history
+HISTORY_PER_USER = 500
+
+# 📈 Движок рейтинга: "flat" (±25, по умолчанию), "elo" или "glicko2" — включаются через env
+RATING_ENGINE = os.getenv("RATING_ENGINE", "flat")
+ELO_K = 50  # при равных рейтингах даёт те же ±25
+GLICKO_TAU = 0.5
+
+# 📉 Бинарный журнал изменений рейтинга (для /progress)
+RATING_SERIES_FILE = "rating_series.bin"
+
+# 🤝 Журнал событий траст-фактора и период полураспада старых событий
+TRUST_EVENT_FILE = "trust_events.bin"
+TRUST_HALF_LIFE = 30 * 24 * 60 * 60
@@ -0,0 +1,84 @@
+# core/balance.py
+#
+# Балансировка команд 5v5: перебираем все 126 различных разбиений
+# десяти игроков на две пятёрки (игрок 0 всегда в BLUE, зеркальные
+# варианты не считаем) и выбираем разбиение с минимальной стоимостью.
+# Считается матрично, поэтому можно оценивать сразу много групп-кандидатов.
+
+import itertools
+
+import numpy as np
+
+from core.trust import get_trust_score
+
+TEAM_SIZE = 5
+
+# За каждый пункт разницы суммарного траст-фактора — столько «штрафных» ELO
+TRUST_WEIGHT = 0.5
+
+# Штраф за команду без живых игроков: в ней некого назначить капитаном
+ROLE_PENALTY = 10_000
+
+# (126, 10): 1 — игрок в BLUE, 0 — в RED
+SPLITS = np.array(
+    [
+        [1 if i in blue else 0 for i in range(2 * TEAM_SIZE)]
+        for blue in itertools.combinations(range(2 * TEAM_SIZE), TEAM_SIZE)
+        if 0 in blue
+    ],
+    dtype=np.int64,
+)
+
+
+def split_costs(elos, trust=None, humans=None) -> np.ndarray:
+    """Стоимость каждого разбиения для каждой группы.
+
+    elos, trust, humans — массивы формы (W, 10); результат — (W, 126).
+    Основной член — разница суммарного ELO команд; траст и наличие
+    живых игроков в обеих командах учитываются, если переданы.
+    """
+    elos = np.asarray(elos, dtype=np.float64)
+    blue = elos @ SPLITS.T
+    costs = np.abs(2 * blue - elos.sum(axis=1, keepdims=True))
+
+    if trust is not None:
+        trust = np.asarray(trust, dtype=np.float64)
+        blue_trust = trust @ SPLITS.T
+        costs += TRUST_WEIGHT * np.abs(2 * blue_trust - trust.sum(axis=1, keepdims=True))
+
+    if humans is not None:
+        humans = np.asarray(humans, dtype=np.int64)
+        blue_humans = humans @ SPLITS.T
+        red_humans = humans.sum(axis=1, keepdims=True) - blue_humans
+        enough = humans.sum(axis=1, keepdims=True) >= 2
+        costs += ROLE_PENALTY * (enough & ((blue_humans == 0) | (red_humans == 0)))
+
+    return costs
+
+
+def best_splits(elos, trust=None, humans=None) -> tuple[np.ndarray, np.ndarray]:
+    """Лучшее разбиение для каждой группы: (стоимость (W,), индекс в SPLITS (W,))."""
+    costs = split_costs(elos, trust, humans)
+    best = costs.argmin(axis=1)
+    return costs[np.arange(len(costs)), best], best
+
+
+def player_features(players: list[dict]) -> tuple[list[int], list[int], list[int]]:
+    elos = [int(p.get("elo") or 0) for p in players]
+    trust = [get_trust_score(p["user_id"]) for p in players]
+    humans = [0 if p.get("is_bot") else 1 for p in players]
+    return elos, trust, humans
+
+
+def balance_teams(players: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Делит десять игроков на две максимально равные пятёрки."""
+    if len(players) != 2 * TEAM_SIZE:
+        half = len(players) // 2
+        return players[:half], players[half:]
+
+    elos, trust, humans = player_features(players)
+    _, best = best_splits([elos], [trust], [humans])
+    mask = SPLITS[best[0]]
+    blue = [p for p, side in zip(players, mask, strict=True) if side]
+    red = [p for p, side in zip(players, mask, strict=True) if not side]
+    return blue, red
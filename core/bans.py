@@ -1,40 +1,63 @@
 # core/bans.py
 
+import heapq
 import time
-import json
 from config import BAN_FILE
-from core import globals
+from core import globals, storage
+
+
+# 🗓️ Индекс окончаний банов: куча (until, user_id). Записи не удаляются при
+# разбане или перебане — устаревшие отбрасываются при извлечении.
+_expiry: list[tuple[int, str]] = []
+
+BAN_SWEEP_INTERVAL = 30  # как часто (в секундах) снимаем истёкшие баны
 
 
 def load_bans():
-    try:
-        with open(BAN_FILE, 'r') as f:
-            globals.bans = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.bans = {}
-        save_bans()
+    globals.bans = storage.load_table("bans")
+    _expiry.clear()
+    for uid, ban_info in globals.bans.items():
+        until = ban_info.get("until", -1)
+        if until != -1:
+            _expiry.append((until, str(uid)))
+    heapq.heapify(_expiry)
 
 
 def save_bans():
-    with open(BAN_FILE, 'w') as f:
-        json.dump(globals.bans, f)
+    storage.mark_dirty("bans")
 
 
-def is_banned(user_id):
+storage.register("bans", BAN_FILE, lambda: globals.bans, sqlite=True)
+
+
+def get_ban(user_id, now=None):
+    """Действующий бан игрока ({"until", "reason"}) или None. Только чтение."""
     ban_info = globals.bans.get(str(user_id))
     if not ban_info:
-        return False
-
+        return None
     until = ban_info.get("until", -1)
-    if until == -1:
-        return "permanent"
+    if until != -1 and until <= (time.time() if now is None else now):
+        return None  # истёк, фоновая чистка скоро его удалит
+    return ban_info
 
-    if time.time() > until:
-        del globals.bans[str(user_id)]
-        save_bans()
+
+def is_banned(user_id):
+    ban_info = get_ban(user_id)
+    if ban_info is None:
         return False
+    return "permanent" if ban_info.get("until", -1) == -1 else "temporary"
 
-    return "temporary"
+
+def ban_until(user_id, until, reason="не указана"):
+    """Банит игрока до момента until (-1 — навсегда)."""
+    uid = str(user_id)
+    globals.bans[uid] = {
+        "until": until,
+        "reason": reason
+    }
+    if until != -1:
+        heapq.heappush(_expiry, (until, uid))
+    save_bans()
 
 
 def ban_user(user_id, duration_minutes=None, reason="не указана"):
@@ -44,11 +67,7 @@ def ban_user(user_id, duration_minutes=None, reason="не указана"):
     else:
         until = now + duration_minutes * 60
 
-    globals.bans[str(user_id)] = {
-        "until": until,
-        "reason": reason
-    }
-    save_bans()
+    ban_until(user_id, until, reason)
 
 
 def unban_user(user_id):
@@ -58,3 +77,26 @@ def unban_user(user_id):
         save_bans()
         return True
     return False
+
+
+def sweep_expired(now=None) -> int:
+    """Снимает все истёкшие баны; одна запись на диск на всю пачку."""
+    now = time.time() if now is None else now
+    removed = 0
+    while _expiry and _expiry[0][0] <= now:
+        until, uid = heapq.heappop(_expiry)
+        ban_info = globals.bans.get(uid)
+        if ban_info and ban_info.get("until", -1) == until:
+            del globals.bans[uid]
+            removed += 1
+    if removed:
+        save_bans()
+    return removed
+
+
+async def sweep_job(_context):
+    sweep_expired()
+
+
+def start(job_queue):
+    job_queue.run_repeating(sweep_job, interval=BAN_SWEEP_INTERVAL, first=BAN_SWEEP_INTERVAL)
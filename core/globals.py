@@ -1,6 +1,11 @@
 # core/globals.py
 
 from config import *
+from core.outbox import Outbox
+from core.player_queue import PlayerQueue
+from core.profiles import ProfileCache
+from core.timers import TimerWheel
+from core.ttlmap import TTLMap
 
 try:
   BOT_PLAYER_IDS = set(BOT_PLAYER_IDS)
@@ -17,6 +22,9 @@ ratings = {}
 # 📜 История матчей (match_id: dict)
 matches = {}  
 
+# 🗂️ Индекс истории: user_id (int) → deque последних match_id, от старых к новым
+match_index = {}
+
 # 🚫 Забаненные пользователи (user_id: причина/время)
 bans = {}  
 
@@ -26,18 +34,18 @@ infractions = {}
 # 🤝 Уровень доверия (user_id: trust_score)
 trust_data = {}  
 
-# 📝 Лог жалоб (user_id: список жалоб)
-report_log = {}  
+# 📝 Лог жалоб ("reporter:target": время жалобы), записи живут сутки
+report_log = TTLMap(24 * 60 * 60)
 
 # 🏷️ Имена пользователей (user_id: имя)
 names = {}  
 
-# 🎯 Очередь 1v1 — список участников, ищущих матч
-# [{'user_id': ..., 'elo': ..., 'joined_at': ..., 'notify_message_id': ..., 'chat_id': ...}]
-queue_1v1 = []
+# 🎯 Очередь 1v1 — участники, ищущие матч, с индексом по user_id
+# {'user_id': ..., 'elo': ..., 'joined_at': ..., 'notify_message_id': ..., 'chat_id': ...}
+queue_1v1 = PlayerQueue()
 
-# 🏆 Очередь 5v5 — список команд, ищущих матч
-queue_5v5 = []
+# 🏆 Очередь 5v5 — игроки, ищущие матч 5v5
+queue_5v5 = PlayerQueue()
 
 # 🔥 Активные 1v1 матчи (match_id: dict)
 active_matches = {}
@@ -48,23 +56,27 @@ pending_results = {}
 # 🕑 Кулдаун на смену имени (user_id: timestamp)
 name_change_timestamps = {}
 
-# ⏱️ Кулдаун на команды (user_id: timestamp)
-user_cooldowns = {}
+# ⏱️ Кулдаун на команды (user_id: timestamp), записи живут до конца кулдауна
+user_cooldowns = TTLMap(60)
 
-# 👤 Последние username'ы (user_id: username)
-usernames = {}
+# 👤 Кэш username'ов из апдейтов и get_chat (user_id: "@username"), с TTL
+usernames = ProfileCache()
 
 # 🧠 Ссылка на Telegram JobQueue (назначается в main.py)
 job_queue = None
 
-# ⏰ Напоминания о матчах (match_id: job)
-match_reminders = {}
+# ⏰ Колесо таймеров: обновление статусов поиска ("search_status", mode)
+# и автоподтверждение результатов ("autoconfirm", match_id)
+timers = TimerWheel()
+
+# 🧲 Запланированные проходы матчмейкинга после событий очереди (mode: job)
+matchmaking_jobs = {}
 
-# 🔄 Повторяющиеся напоминания о поиске (user_id: job)
-search_jobs = {}
+# ⌛ Таймеры расширения допуска ELO — ближайший момент, когда может сложиться матч (mode: job)
+matchmaking_deadlines = {}
 
-# 🚀 Функция для отправки напоминания (назначается при запуске)
-send_search_reminder = None
+# 📤 Общая очередь исходящих сообщений (воркеры запускаются в main.py)
+outbox = Outbox()
 
 # 🐞 DEBUG-режим для тестирования функционала
 DEBUG_MODE = True
@@ -0,0 +1,174 @@
+# core/history.py
+#
+# Журнал истории матчей: набор JSONL-сегментов только на дозапись.
+# Каждый завершённый матч — одна строка в активном сегменте, поэтому
+# стоимость записи не зависит от общего количества матчей.
+#
+# Сегмент закрывается, только набрав MATCH_SEGMENT_RECORDS матчей, а из
+# журнала ничего не удаляется — поэтому отдельное сжатие не нужно: число
+# сегментов и так ограничено (всего матчей / MATCH_SEGMENT_RECORDS).
+
+import json
+import logging
+import os
+
+from config import MATCH_FILE, MATCH_LOG_DIR, MATCH_SEGMENT_RECORDS
+from core import storage
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = os.path.join(MATCH_LOG_DIR, "index.json")
+
+# 🗂️ Индекс сегментов: [{"file", "records", "bytes", "first_ts", "last_ts"}, ...]
+# Последний сегмент в списке — активный, в него идёт дозапись
+_segments: list[dict] = []
+
+
+def _segment_path(segment: dict) -> str:
+    return os.path.join(MATCH_LOG_DIR, segment["file"])
+
+
+def _segment_number(segment: dict) -> int:
+    return int(segment["file"].split(".")[0])
+
+
+def _new_segment() -> dict:
+    number = _segment_number(_segments[-1]) + 1 if _segments else 1
+    segment = {
+        "file": f"{number:06d}.jsonl",
+        "records": 0,
+        "bytes": 0,
+        "first_ts": None,
+        "last_ts": None,
+    }
+    _segments.append(segment)
+    return segment
+
+
+def _encode(match_id: str, data: dict) -> bytes:
+    record = {"match_id": match_id, **data}
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+def _track(segment: dict, data: dict, size: int):
+    ts = data.get("timestamp")
+    segment["records"] += 1
+    segment["bytes"] += size
+    if ts is not None:
+        if segment["first_ts"] is None:
+            segment["first_ts"] = ts
+        segment["last_ts"] = ts
+
+
+def _recover_tail(segment: dict):
+    """Досчитывает записи, сделанные после последнего сохранения индекса."""
+    path = _segment_path(segment)
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        segment.update(records=0, bytes=0, first_ts=None, last_ts=None)
+        return
+
+    if size == segment["bytes"]:
+        return
+
+    with open(path, "rb+") as f:
+        f.seek(segment["bytes"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Недописанная строка после падения — отрезаем
+                f.truncate(segment["bytes"])
+                logger.warning(f"✂️ Обрезан повреждённый хвост сегмента {segment['file']}")
+                break
+            _track(segment, json.loads(line), len(line))
+    storage.mark_dirty("match_index")
+
+
+def _import_legacy():
+    """Переносит старый matches.json в журнал (однократно)."""
+    try:
+        with open(MATCH_FILE, "r") as f:
+            legacy = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+
+    legacy_items = sorted(legacy.items(), key=lambda item: item[1].get("timestamp", 0))
+    for match_id, data in legacy_items:
+        append(match_id, data)
+    logger.info(f"📦 Импортировано {len(legacy_items)} матчей из {MATCH_FILE}")
+
+
+def _rebuild_index():
+    """Восстанавливает индекс по файлам сегментов, если index.json потерян."""
+    files = sorted(
+        (name for name in os.listdir(MATCH_LOG_DIR) if name.endswith(".jsonl")),
+        key=lambda name: (int(name.split(".")[0]), name),
+    )
+    for name in files:
+        segment = {"file": name, "records": 0, "bytes": 0, "first_ts": None, "last_ts": None}
+        _segments.append(segment)
+        _recover_tail(segment)
+    return bool(files)
+
+
+def open_log():
+    """Загружает индекс сегментов и готовит журнал к дозаписи."""
+    os.makedirs(MATCH_LOG_DIR, exist_ok=True)
+    _segments.clear()
+    try:
+        with open(INDEX_FILE, "r") as f:
+            _segments.extend(json.load(f)["segments"])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        if not _rebuild_index():
+            _new_segment()
+            _import_legacy()
+        storage.mark_dirty("match_index")
+        return
+
+    if not _segments:
+        _new_segment()
+    _recover_tail(_segments[-1])
+
+
+def _read_segment(f, segment: dict, since_ts: int | None):
+    read = 0
+    for line in f:
+        read += len(line)
+        if read > segment["bytes"] or not line.endswith(b"\n"):
+            break  # хвост, ещё не учтённый в индексе или дописываемый прямо сейчас
+        record = json.loads(line)
+        match_id = record.pop("match_id")
+        if since_ts is not None and record.get("timestamp", 0) < since_ts:
+            continue
+        yield match_id, record
+
+
+def iter_records(since_ts: int | None = None):
+    """Построчно читает журнал, не загружая его целиком.
+
+    Сегменты, которые целиком старше since_ts, пропускаются по индексу.
+    """
+    for segment in list(_segments):
+        if since_ts is not None and segment["last_ts"] is not None and segment["last_ts"] < since_ts:
+            continue
+        try:
+            with open(_segment_path(segment), "rb") as f:
+                yield from _read_segment(f, segment, since_ts)
+        except FileNotFoundError:
+            continue
+
+
+def append(match_id: str, data: dict):
+    """Дописывает один матч в активный сегмент (через поток-писатель)."""
+    segment = _segments[-1] if _segments else _new_segment()
+    if segment["records"] >= MATCH_SEGMENT_RECORDS:
+        segment = _new_segment()
+
+    line = _encode(match_id, data)
+    storage.submit(storage.append_bytes, _segment_path(segment), line)
+
+    _track(segment, data, len(line))
+    storage.mark_dirty("match_index")
+
+
+storage.register("match_index", INDEX_FILE, lambda: {"segments": _segments}, indent=1)
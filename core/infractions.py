@@ -1,36 +1,48 @@
 # core/infractions.py
 
 import time
-import json
 from config import INFRACTIONS_FILE
-from core import globals
-from core.trust import recalculate_trust_score
+from core import globals, storage, trust
+from core.bans import ban_until
 
 
 def load_infractions():
-    try:
-        with open(INFRACTIONS_FILE, 'r') as f:
-            globals.infractions = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.infractions = {}
-        save_infractions()
+    globals.infractions = storage.load_table("infractions")
 
 
 def save_infractions():
-    with open(INFRACTIONS_FILE, 'w') as f:
-        json.dump(globals.infractions, f)
+    storage.mark_dirty("infractions")
 
 
-async def register_infraction(user_id, infraction_type, context=None):
-    uid = str(user_id)
-    now = int(time.time())
+storage.register("infractions", INFRACTIONS_FILE, lambda: globals.infractions, sqlite=True)
+
+
+RESET_PERIOD = 24 * 60 * 60  # предупреждения обнуляются раз в сутки (в полночь UTC)
+
 
+def _get_record(uid: str, now: int) -> dict:
+    """Запись игрока; суточный сброс предупреждений применяется лениво, при обращении.
+
+    last_reset хранится в самой записи, поэтому расписание переживает перезапуск бота.
+    """
+    epoch = now - now % RESET_PERIOD
     user_data = globals.infractions.get(uid, {
         "warnings": 0,
         "strikes": 0,
         "clean_games": 0,
-        "last_reset": now
+        "last_reset": epoch
     })
+    if user_data.get("last_reset", 0) < epoch:
+        user_data["warnings"] = 0
+        user_data["last_reset"] = epoch
+    return user_data
+
+
+def register_infraction(user_id, infraction_type):
+    uid = str(user_id)
+    now = int(time.time())
+
+    user_data = _get_record(uid, now)
 
     user_data["warnings"] += 1
     user_data["clean_games"] = 0
@@ -56,39 +68,21 @@ async def register_infraction(user_id, infraction_type, context=None):
         ban_duration = int(end_of_day - now)
 
     if ban_duration:
-        globals.bans[str(user_id)] = {
-            "until": now + ban_duration,
-            "reason": reason
-        }
+        ban_until(user_id, now + ban_duration, reason)
         result = "ban"
 
     globals.infractions[uid] = user_data
     save_infractions()
 
-    # Trust снижение
-    tuid = uid
-    if tuid not in globals.trust_data:
-        globals.trust_data[tuid] = {
-            "reports": 0,
-            "confirmed_matches": 0,
-            "afk": 0,
-            "trust_score": 100
-        }
-
-    globals.trust_data[tuid]["afk"] += 1
-    await recalculate_trust_score(user_id, context, reason="AFK или отказ от участия в матче")
+    # Trust снижение (зафиксирует вызывающий через trust.commit)
+    trust.record_event(user_id, trust.AFK, now)
     return result
 
 
-async def register_clean_game(user_id, context=None):
+def register_clean_game(user_id):
     uid = str(user_id)
 
-    user_data = globals.infractions.get(uid, {
-        "warnings": 0,
-        "strikes": 0,
-        "clean_games": 0,
-        "last_reset": int(time.time())
-    })
+    user_data = _get_record(uid, int(time.time()))
 
     user_data["clean_games"] += 1
 
@@ -100,15 +94,4 @@ async def register_clean_game(user_id, context=None):
     globals.infractions[uid] = user_data
     save_infractions()
 
-    if uid not in globals.trust_data:
-        globals.trust_data[uid] = {
-            "reports": 0,
-            "confirmed_matches": 0,
-            "afk": 0,
-            "trust_score": 100
-        }
-
-    globals.trust_data[uid]["confirmed_matches"] += 1
-    from core.trust import save_trust
-    save_trust()
-    await recalculate_trust_score(user_id, context, reason="честное участие в матчах")
+    trust.record_event(user_id, trust.CLEAN)
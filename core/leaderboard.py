@@ -0,0 +1,167 @@
+# core/leaderboard.py
+#
+# Индекс лидерборда: дерево Фенвика по значениям рейтинга (сколько игроков
+# с рейтингом ≤ r) и «корзины» игроков по каждому значению рейтинга.
+# Место игрока — O(log R), топ-k — O(k log R) без сортировки всех рейтингов.
+# Обновляется инкрементально из update_ratings.
+#
+# Индекс держится в памяти целиком и по замыслу: на игрока — только user_id
+# и целый рейтинг (без записей профиля), даже при STORAGE_BACKEND=sqlite.
+# Строится при загрузке потоком пар (user_id, рейтинг) — для SQLite прямо из
+# колонки rating, без разбора JSON и без заполнения кэша таблицы.
+
+TOP_SIZE = 10
+INITIAL_SIZE = 4096
+
+_tree: list[int] = [0] * (INITIAL_SIZE + 1)
+_size = INITIAL_SIZE
+_total = 0
+
+# рейтинг → {user_id: None} (порядок вставки — порядок при равном рейтинге)
+_buckets: dict[int, dict[str, None]] = {}
+# user_id → рейтинг в индексе
+_ratings: dict[str, int] = {}
+
+# Топ (user_id, рейтинг) и рейтинг последнего игрока в нём. Имена здесь не
+# хранятся: они меняются независимо от рейтинга и подставляются при каждом показе
+_top_entries: list[tuple[str, int]] | None = None
+_top_threshold = 0
+
+
+def _key(rating) -> int:
+    return max(0, int(round(rating)))
+
+
+def _add(rating: int, delta: int):
+    i = rating + 1
+    while i <= _size:
+        _tree[i] += delta
+        i += i & -i
+
+
+def _count_upto(rating: int) -> int:
+    """Сколько игроков с рейтингом ≤ rating."""
+    i = min(rating + 1, _size)
+    count = 0
+    while i > 0:
+        count += _tree[i]
+        i -= i & -i
+    return count
+
+
+def _kth(k: int) -> int:
+    """Рейтинг k-го (с 1) игрока по возрастанию."""
+    pos = 0
+    step = 1 << _size.bit_length()
+    while step:
+        nxt = pos + step
+        if nxt <= _size and _tree[nxt] < k:
+            pos = nxt
+            k -= _tree[nxt]
+        step >>= 1
+    return pos
+
+
+def _grow(rating: int):
+    global _tree, _size
+    while rating >= _size:
+        _size *= 2
+    _tree = [0] * (_size + 1)
+    for value, bucket in _buckets.items():
+        _add(value, len(bucket))
+
+
+def _insert(uid: str, rating: int):
+    global _total
+    if rating >= _size:
+        _grow(rating)
+    _ratings[uid] = rating
+    _buckets.setdefault(rating, {})[uid] = None
+    _add(rating, 1)
+    _total += 1
+
+
+def _remove(uid: str):
+    global _total
+    rating = _ratings.pop(uid, None)
+    if rating is None:
+        return
+    bucket = _buckets[rating]
+    del bucket[uid]
+    if not bucket:
+        del _buckets[rating]
+    _add(rating, -1)
+    _total -= 1
+
+
+def rebuild(ratings):
+    """Строит индекс заново по парам (user_id, рейтинг) (при загрузке)."""
+    global _tree, _size, _total, _buckets, _ratings
+    _tree = [0] * (INITIAL_SIZE + 1)
+    _size = INITIAL_SIZE
+    _total = 0
+    _buckets = {}
+    _ratings = {}
+    for uid, rating in ratings:
+        _insert(str(uid), _key(rating))
+    invalidate_top()
+
+
+def update(user_id, rating):
+    """Новый рейтинг игрока (в том числе нового)."""
+    uid = str(user_id)
+    rating = _key(rating)
+    old = _ratings.get(uid)
+    if old == rating:
+        return
+    _remove(uid)
+    _insert(uid, rating)
+    # Кэш топа сбрасывается, только если изменение его касается
+    if _total <= TOP_SIZE or max(rating, old if old is not None else -1) >= _top_threshold:
+        invalidate_top()
+
+
+def top(k: int = TOP_SIZE) -> list[str]:
+    """user_id первых k игроков по убыванию рейтинга."""
+    result = []
+    taken = 0
+    while len(result) < k and taken < _total:
+        rating = _kth(_total - taken)
+        bucket = _buckets[rating]
+        for uid in bucket:
+            result.append(uid)
+            if len(result) == k:
+                break
+        taken += len(bucket)
+    return result
+
+
+def rank(user_id) -> tuple[int, int] | None:
+    """(место, всего игроков); при равном рейтинге — одно место на всех."""
+    rating = _ratings.get(str(user_id))
+    if rating is None:
+        return None
+    return _total - _count_upto(rating) + 1, _total
+
+
+def percentile(user_id) -> float | None:
+    """Доля игроков (в %), у которых рейтинг ниже, чем у этого игрока."""
+    rating = _ratings.get(str(user_id))
+    if rating is None:
+        return None
+    below = _count_upto(rating - 1) if rating > 0 else 0
+    return 100.0 * below / _total
+
+
+def top_entries() -> list[tuple[str, int]]:
+    """(user_id, рейтинг) первых TOP_SIZE игроков; пересчитывается, только когда топ изменился."""
+    global _top_entries, _top_threshold
+    if _top_entries is None:
+        _top_entries = [(uid, _ratings[uid]) for uid in top(TOP_SIZE)]
+        _top_threshold = _top_entries[-1][1] if _top_entries else 0
+    return _top_entries
+
+
+def invalidate_top():
+    global _top_entries
+    _top_entries = None
@@ -0,0 +1,272 @@
+# core/matching.py
+#
+# Подбор соперников по ELO. Допуск растёт со временем ожидания:
+# 100 ELO сразу, +50 каждые 30 секунд, но не больше 300.
+# Пара подходит, если разница ELO укладывается в допуск того,
+# кто ждёт дольше (т.е. в больший из двух допусков).
+#
+# За один проход формируются все возможные матчи. Стратегия (MATCHMAKING_STRATEGY):
+#   "quality"    — жадно, начиная с самых близких по ELO пар/групп;
+#   "throughput" — максимум матчей за проход, даже ценой чуть больших разниц.
+
+import heapq
+import itertools
+import math
+
+from config import MATCHMAKING_STRATEGY
+from core.balance import best_splits
+
+BASE_TOLERANCE = 100
+TOLERANCE_STEP = 50
+TOLERANCE_STEP_SECONDS = 30
+MAX_TOLERANCE = 300
+
+
+def tolerance(joined_at: float, now: float) -> int:
+    elapsed = now - joined_at
+    return min(BASE_TOLERANCE + int(elapsed // TOLERANCE_STEP_SECONDS) * TOLERANCE_STEP, MAX_TOLERANCE)
+
+
+def sorted_by_elo(queue, now: float) -> list[tuple[int, float, int, dict]]:
+    """Очередь, отсортированная по ELO: (elo, joined_at, допуск, запись).
+
+    Допуск каждого игрока считается один раз за проход.
+    """
+    return sorted(
+        ((p["elo"], p["joined_at"], tolerance(p["joined_at"], now), p) for p in queue),
+        key=lambda item: (item[0], item[1]),
+    )
+
+
+def _pair_fits(left, right) -> bool:
+    return right[0] - left[0] <= max(left[2], right[2])
+
+
+def _pairs_by_quality(ordered) -> list[tuple[int, int]]:
+    """Жадно берём самые близкие по ELO пары (при равенстве — кто дольше ждёт).
+
+    Кандидаты — только соседние пары; после того как пара забрана,
+    её соседи слева и справа становятся соседями друг другу.
+    """
+    n = len(ordered)
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    taken = [False] * n
+    heap = []
+
+    def _push(i, j):
+        if i >= 0 and j < n and _pair_fits(ordered[i], ordered[j]):
+            key = (ordered[j][0] - ordered[i][0], min(ordered[i][1], ordered[j][1]))
+            heapq.heappush(heap, (key, i, j))
+
+    for i in range(n - 1):
+        _push(i, i + 1)
+
+    pairs = []
+    while heap:
+        _, i, j = heapq.heappop(heap)
+        if taken[i] or taken[j] or nxt[i] != j:
+            continue
+        taken[i] = taken[j] = True
+        pairs.append((i, j))
+        left, right = prev[i], nxt[j]
+        if left >= 0:
+            nxt[left] = right
+        if right < n:
+            prev[right] = left
+        _push(left, right)
+    return pairs
+
+
+def _pairs_by_throughput(ordered) -> list[tuple[int, int]]:
+    """Максимум пар среди соседних (динамика по отсортированному списку).
+
+    При равном числе пар выбирается вариант с меньшей суммарной разницей ELO.
+    Оставшиеся игроки, ставшие соседями после разбора пар, добираются жадно.
+    """
+    n = len(ordered)
+    # best[k] — (число пар, -суммарная разница) для первых k игроков
+    best = [(0, 0)] * (n + 1)
+    took = [False] * (n + 1)
+    for k in range(2, n + 1):
+        best[k] = best[k - 1]
+        left, right = ordered[k - 2], ordered[k - 1]
+        if _pair_fits(left, right):
+            count, neg_gap = best[k - 2]
+            candidate = (count + 1, neg_gap - (right[0] - left[0]))
+            if candidate > best[k]:
+                best[k] = candidate
+                took[k] = True
+
+    pairs = []
+    k = n
+    while k >= 2:
+        if took[k]:
+            pairs.append((k - 2, k - 1))
+            k -= 2
+        else:
+            k -= 1
+    pairs.reverse()
+
+    matched = {i for pair in pairs for i in pair}
+    rest = [i for i in range(n) if i not in matched]
+    for i, j in _pairs_by_quality([ordered[i] for i in rest]):
+        pairs.append((rest[i], rest[j]))
+    return pairs
+
+
+def find_pairs_1v1(queue, now: float, strategy: str = MATCHMAKING_STRATEGY) -> list[tuple[dict, dict]]:
+    """Все пары 1v1 за один проход, O(n log n).
+
+    Лучший соперник игрока — ближайший по ELO, т.е. сосед в отсортированном
+    списке: если подходит кто-то дальше, то подходит и сосед. Поэтому
+    достаточно рассматривать соседние пары.
+    """
+    ordered = sorted_by_elo(queue, now)
+    if strategy == "throughput":
+        indices = _pairs_by_throughput(ordered)
+    else:
+        indices = _pairs_by_quality(ordered)
+
+    pairs = []
+    for i, j in indices:
+        p1, p2 = ordered[i][3], ordered[j][3]
+        # Первым идёт тот, кто раньше встал в очередь (он же лидер лобби)
+        pairs.append((p1, p2) if p1["joined_at"] <= p2["joined_at"] else (p2, p1))
+    return pairs
+
+
+GROUP_SIZE = 10
+
+
+def _windows_5v5(ordered) -> list[tuple[int, int]]:
+    """Подходящие окна из 10 соседних по ELO игроков: (разброс ELO, начало окна).
+
+    Самая плотная десятка — всегда подряд идущая в отсортированном списке;
+    допуск окна — максимальный допуск в нём (кто дольше всех ждёт).
+    """
+    windows = []
+    for i in range(len(ordered) - GROUP_SIZE + 1):
+        spread = ordered[i + GROUP_SIZE - 1][0] - ordered[i][0]
+        if spread <= max(item[2] for item in ordered[i:i + GROUP_SIZE]):
+            windows.append((spread, i))
+    return windows
+
+
+def _pick_windows(ordered, strategy: str) -> list[list[dict]]:
+    windows = _windows_5v5(ordered)
+    if not windows:
+        return []
+
+    if strategy == "throughput":
+        # Окна одной длины: жадно слева направо даёт максимум непересекающихся
+        windows.sort(key=lambda window: window[1])
+    else:
+        # Сначала самые плотные группы, при равенстве — с лучшим балансом команд
+        elos = [[item[0] for item in ordered[i:i + GROUP_SIZE]] for _, i in windows]
+        imbalance = best_splits(elos)[0].tolist()
+        order = sorted(range(len(windows)), key=lambda k: (windows[k][0], imbalance[k], windows[k][1]))
+        windows = [windows[k] for k in order]
+
+    used = [False] * len(ordered)
+    groups = []
+    for _, i in windows:
+        if any(used[i:i + GROUP_SIZE]):
+            continue
+        used[i:i + GROUP_SIZE] = [True] * GROUP_SIZE
+        groups.append([item[3] for item in ordered[i:i + GROUP_SIZE]])
+    return groups
+
+
+def find_groups_5v5(queue, now: float, strategy: str = MATCHMAKING_STRATEGY) -> list[list[dict]]:
+    """Все непересекающиеся группы по 10 игроков, O(n log n) на проход.
+
+    Ищем по очереди, отсортированной по ELO, а не по порядку входа, —
+    так близкие по рейтингу игроки находят друг друга, даже если
+    вставали в очередь в разное время. После выбора групп оставшиеся
+    игроки становятся соседями, поэтому проход повторяется, пока
+    находятся новые группы.
+    """
+    ordered = sorted_by_elo(queue, now)
+    groups = []
+    while True:
+        found = _pick_windows(ordered, strategy)
+        if not found:
+            return groups
+        groups.extend(found)
+        taken = {id(p) for group in found for p in group}
+        ordered = [item for item in ordered if id(item[3]) not in taken]
+
+
+def _reach_time(gap: int, joined_at: float) -> float | None:
+    """Когда допуск игрока, вставшего в очередь в joined_at, дорастёт до gap."""
+    if gap <= BASE_TOLERANCE:
+        return joined_at
+    if gap > MAX_TOLERANCE:
+        return None
+    steps = math.ceil((gap - BASE_TOLERANCE) / TOLERANCE_STEP)
+    return joined_at + steps * TOLERANCE_STEP_SECONDS
+
+
+def _earliest(times) -> float | None:
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+def next_deadline_1v1(queue, now: float) -> float | None:
+    """Ближайший момент, когда из-за роста допуска станет возможна новая пара 1v1.
+
+    Достаточно соседних по ELO пар: дальние становятся допустимыми не раньше.
+    None — ни одна пара не сложится, пока очередь не изменится.
+    """
+    ordered = sorted_by_elo(queue, now)
+    return _earliest(
+        _reach_time(right[0] - left[0], min(left[1], right[1]))
+        for left, right in itertools.pairwise(ordered)
+    )
+
+
+def next_deadline_5v5(queue, now: float) -> float | None:
+    """То же для групп 5v5: по всем окнам из 10 соседних по ELO игроков."""
+    ordered = sorted_by_elo(queue, now)
+    return _earliest(
+        _reach_time(
+            ordered[i + GROUP_SIZE - 1][0] - ordered[i][0],
+            min(item[1] for item in ordered[i:i + GROUP_SIZE]),
+        )
+        for i in range(len(ordered) - GROUP_SIZE + 1)
+    )
+
+
+def estimate_waits_1v1(queue, now: float) -> dict[int, float | None]:
+    """Оценка ожидания каждого игрока 1v1 (сек): когда допуск дорастёт до ближайшего соседа по ELO.
+
+    None — соседа нет или разница больше максимального допуска.
+    """
+    ordered = sorted_by_elo(queue, now)
+    waits = {}
+    for i, item in enumerate(ordered):
+        times = [
+            _reach_time(abs(other[0] - item[0]), min(other[1], item[1]))
+            for other in ordered[max(i - 1, 0):i] + ordered[i + 1:i + 2]
+        ]
+        at = _earliest(times)
+        waits[item[3]["user_id"]] = None if at is None else max(at - now, 0.0)
+    return waits
+
+
+def estimate_waits_5v5(queue, now: float) -> dict[int, float | None]:
+    """То же для 5v5: по всем окнам из 10 соседних по ELO игроков, куда входит игрок."""
+    ordered = sorted_by_elo(queue, now)
+    windows = [
+        _reach_time(
+            ordered[i + GROUP_SIZE - 1][0] - ordered[i][0],
+            min(item[1] for item in ordered[i:i + GROUP_SIZE]),
+        )
+        for i in range(len(ordered) - GROUP_SIZE + 1)
+    ]
+    waits = {}
+    for i, item in enumerate(ordered):
+        at = _earliest(windows[max(i - GROUP_SIZE + 1, 0):i + 1])
+        waits[item[3]["user_id"]] = None if at is None else max(at - now, 0.0)
+    return waits
@@ -1,53 +1,135 @@
 # core/names.py
 
-import json
 from config import NICK_TIMESTAMP_FILE
-from core import globals
+from core import globals, storage
 
 NAMES_FILE = "names.json"
 
 
+# 🔎 Обратный индекс ников: нормализованный ник → user_id (str)
+_by_name: dict[str, str] = {}
+
+# 🌳 Префиксное дерево нормализованных ников для автодополнения.
+# Узел: {"children": {символ: узел}, "uids": {user_id, ...}}
+_trie: dict = {"children": {}, "uids": set()}
+
+
+def normalize_name(name: str) -> str:
+    """Ник без учёта регистра и лишних пробелов."""
+    return " ".join(name.casefold().split())
+
+
+def _trie_add(key: str, uid: str):
+    node = _trie
+    for char in key:
+        node = node["children"].setdefault(char, {"children": {}, "uids": set()})
+    node["uids"].add(uid)
+
+
+def _trie_remove(key: str, uid: str):
+    path = [_trie]
+    for char in key:
+        node = path[-1]["children"].get(char)
+        if node is None:
+            return
+        path.append(node)
+    path[-1]["uids"].discard(uid)
+    # Убираем опустевшие ветки
+    for char, parent, node in zip(reversed(key), reversed(path[:-1]), reversed(path[1:]), strict=True):
+        if node["children"] or node["uids"]:
+            break
+        del parent["children"][char]
+
+
+def _index_name(uid: str, name: str):
+    key = normalize_name(name)
+    _by_name.setdefault(key, uid)
+    _trie_add(key, uid)
+
+
+def _unindex_name(uid: str, name: str):
+    key = normalize_name(name)
+    _trie_remove(key, uid)
+    if _by_name.get(key) == uid:
+        del _by_name[key]
+        # Старые данные могли содержать ники, совпадающие без учёта регистра
+        others = complete_name(key, limit=1) if key else []
+        if others and normalize_name(globals.names.get(others[0], "")) == key:
+            _by_name[key] = others[0]
+
+
 def load_names():
-    try:
-        with open(NAMES_FILE, "r") as f:
-            globals.names = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.names = {}
-        save_names()
+    globals.names = storage.load_table("names")
+    _by_name.clear()
+    _trie["children"].clear()
+    _trie["uids"].clear()
+    for uid, name in globals.names.items():
+        _index_name(str(uid), name)
 
 
 def save_names():
-    with open(NAMES_FILE, "w") as f:
-        json.dump(globals.names, f, indent=4)
+    storage.mark_dirty("names")
+
+
+def find_user_by_name(name: str) -> str | None:
+    """user_id (str) игрока с таким ником, без учёта регистра; O(длина ника)."""
+    return _by_name.get(normalize_name(name))
+
+
+def set_display_name(user_id, name: str):
+    """Меняет ник игрока, обновляя обратный индекс и дерево префиксов."""
+    uid = str(user_id)
+    old = globals.names.get(uid)
+    if old is not None:
+        _unindex_name(uid, old)
+    globals.names[uid] = name
+    _index_name(uid, name)
+    save_names()
+
+
+def complete_name(prefix: str, limit: int = 10) -> list[str]:
+    """До limit user_id игроков, чей ник начинается с prefix (без учёта регистра)."""
+    node = _trie
+    for char in normalize_name(prefix):
+        node = node["children"].get(char)
+        if node is None:
+            return []
+
+    found = []
+    stack = [node]
+    while stack and len(found) < limit:
+        node = stack.pop()
+        found.extend(sorted(node["uids"])[:limit - len(found)])
+        stack.extend(node["children"][char] for char in sorted(node["children"], reverse=True))
+    return found
+
+
+storage.register("names", NAMES_FILE, lambda: globals.names, sqlite=True, indent=4)
 
 
 def load_nick_timestamps():
-    try:
-        with open(NICK_TIMESTAMP_FILE, "r") as f:
-            globals.name_change_timestamps = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.name_change_timestamps = {}
-        save_nick_timestamps()
+    globals.name_change_timestamps = storage.load_table("nick_timestamps")
 
 
 def save_nick_timestamps():
-    with open(NICK_TIMESTAMP_FILE, "w") as f:
-        json.dump(globals.name_change_timestamps, f)
+    storage.mark_dirty("nick_timestamps")
+
+
+storage.register("nick_timestamps", NICK_TIMESTAMP_FILE, lambda: globals.name_change_timestamps)
 
 
 def cache_username(user):
-    if user.username:
-        globals.usernames[str(user.id)] = f"@{user.username}"
+    globals.usernames.put_user(user)
 
 
 def get_display_name(user_id):
     uid = str(user_id)
     if uid in globals.names:
         return globals.names[uid]
-    elif uid in globals.usernames:
-        return globals.usernames[uid]
-    else:
-        return f"Игрок {uid}"
+    username = globals.usernames.get(user_id)
+    if username:
+        return username
+    return f"Игрок {uid}"
 
 
 def get_display_name_with_link(user_id):
@@ -0,0 +1,199 @@
+# core/outbox.py
+#
+# Общий планировщик исходящих запросов к Telegram Bot API.
+# Запросы выполняются параллельно (не больше OUTBOX_CONCURRENCY разом),
+# с ограничением скорости на весь бот и на каждый чат (token bucket),
+# по приоритетам и с повтором после 429 (RetryAfter).
+
+import asyncio
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+
+from config import (
+    OUTBOX_CHAT_BURST,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_CONCURRENCY,
+    OUTBOX_GLOBAL_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше — важнее
+PRIORITY_MATCH = 0     # найден матч, проверка готовности, отмена
+PRIORITY_RESULT = 1    # результаты матча, ID лобби
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3       # напоминания о поиске, уведомления о трасте
+
+MAX_RETRIES = 3
+
+# Через сколько секунд простоя забываем bucket чата
+IDLE_BUCKET_TTL = 60
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько ждать до появления токена (0 — можно сразу)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Забирает токен в долг; возвращает, сколько нужно подождать до его погашения."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Outbox:
+    def __init__(self, concurrency: int = OUTBOX_CONCURRENCY, global_rate: float = OUTBOX_GLOBAL_RATE,
+                 chat_rate: float = OUTBOX_CHAT_RATE, chat_burst: float = OUTBOX_CHAT_BURST):
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+
+        self._queue: asyncio.PriorityQueue | None = None
+        self._seq = itertools.count()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def backlog(self) -> int:
+        """Сколько запросов ждёт отправки."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, chat_id: int, method, /, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> asyncio.Future:
+        """Ставит вызов method(*args, **kwargs) в очередь и возвращает future с результатом."""
+        future = asyncio.get_running_loop().create_future()
+        job = {"chat_id": chat_id, "method": method, "args": args, "kwargs": kwargs,
+               "future": future, "attempt": 0}
+        self._queue.put_nowait((priority, next(self._seq), job))
+        return future
+
+    async def call(self, chat_id: int, method, /, *args, priority: int = PRIORITY_NORMAL, **kwargs):
+        if not self.running:
+            return await method(*args, **kwargs)
+        return await self.submit(chat_id, method, *args, priority=priority, **kwargs)
+
+    async def send_message(self, bot, chat_id: int, text: str, *, priority: int = PRIORITY_NORMAL, **kwargs):
+        return await self.call(chat_id, bot.send_message, chat_id, text, priority=priority, **kwargs)
+
+    async def edit_message_text(self, bot, chat_id: int, message_id: int, text: str, *,
+                                priority: int = PRIORITY_LOW, **kwargs):
+        return await self.call(
+            chat_id, bot.edit_message_text, text,
+            chat_id=chat_id, message_id=message_id, priority=priority, **kwargs,
+        )
+
+    def post(self, bot, chat_id: int, text: str, *, priority: int = PRIORITY_LOW, **kwargs):
+        """Отправка без ожидания результата — для некритичных уведомлений."""
+        if self.running:
+            future = self.submit(chat_id, bot.send_message, chat_id, text, priority=priority, **kwargs)
+        else:
+            future = asyncio.ensure_future(bot.send_message(chat_id, text, **kwargs))
+        future.add_done_callback(_log_failure)
+
+    def _requeue(self, item, delay: float):
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, item)
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10_000:
+                self._chats = {
+                    cid: b for cid, b in self._chats.items() if now - b.updated < IDLE_BUCKET_TTL
+                }
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            # Сбой одного запроса не должен останавливать воркер — иначе очередь встанет
+            try:
+                await self._process(item)
+            except Exception as exc:
+                logger.exception("❌ Ошибка в воркере отправки")
+                future = item[2]["future"]
+                if not future.done():
+                    future.set_exception(exc)
+
+    async def _process(self, item):
+        _, _, job = item
+        future = job["future"]
+        if future.done():
+            return
+
+        now = time.monotonic()
+        if now < self._paused_until:
+            self._requeue(item, self._paused_until - now)
+            return
+
+        # Лимит чата не держит воркер — запрос вернётся в очередь, когда освободится токен
+        bucket = self._chat_bucket(job["chat_id"], now)
+        wait = bucket.wait_time(now)
+        if wait > 0:
+            self._requeue(item, wait)
+            return
+        bucket.take(now)
+
+        wait = self._global.take(now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        # Пока запрос выполнялся, ожидающий мог отменить future — результат тогда некуда класть
+        try:
+            result = await job["method"](*job["args"], **job["kwargs"])
+        except RetryAfter as exc:
+            retry_after = exc.retry_after
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            job["attempt"] += 1
+            if job["attempt"] > MAX_RETRIES:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                logger.warning(f"⏳ Telegram просит подождать {retry_after} с")
+                self._requeue(item, retry_after)
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+
+def _log_failure(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"⚠️ Не удалось отправить уведомление: {future.exception()}")
+
+
+async def send_all(sends):
+    """Ждёт пачку отправок одновременно; исключения возвращаются, а не пробрасываются."""
+    return await asyncio.gather(*sends, return_exceptions=True)
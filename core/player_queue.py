@@ -0,0 +1,45 @@
+# core/player_queue.py
+
+
+class PlayerQueue:
+    """Очередь поиска матча: порядок входа + индекс user_id → запись.
+
+    Вход, выход, проверка «уже в очереди» и поиск игрока — O(1);
+    обход идёт в порядке входа в очередь.
+    """
+
+    def __init__(self):
+        self._entries: dict[int, dict] = {}
+
+    def append(self, entry: dict):
+        """Ставит игрока в конец очереди (повторный вход заменяет старую запись)."""
+        user_id = entry["user_id"]
+        self._entries.pop(user_id, None)
+        self._entries[user_id] = entry
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def get(self, user_id: int) -> dict | None:
+        return self._entries.get(user_id)
+
+    def remove(self, user_id: int) -> dict | None:
+        """Убирает игрока из очереди и возвращает его запись (None — его там не было)."""
+        return self._entries.pop(user_id, None)
+
+    def remove_many(self, user_ids):
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._entries
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
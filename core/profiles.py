@@ -0,0 +1,84 @@
+# core/profiles.py
+#
+# Кэш профилей Telegram (username по user_id) поверх TTLMap: TTL и вытеснение
+# давно не читанных сверх PROFILE_CACHE_SIZE.
+# Заполняется бесплатно из апдейтов (cache_username), а за недостающими
+# ходит в get_chat — одновременные запросы одного и того же пользователя
+# склеиваются в один.
+
+import asyncio
+import logging
+import time
+
+from core.ttlmap import TTLMap
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TTL = 6 * 60 * 60      # username из апдейта/get_chat живёт 6 часов
+FAILED_TTL = 5 * 60            # неудачный get_chat не повторяем 5 минут
+PROFILE_CACHE_SIZE = 10_000
+
+
+def _format(user) -> str | None:
+    return f"@{user.username}" if user.username else None
+
+
+class ProfileCache:
+    def __init__(self, ttl: float = PROFILE_TTL, maxsize: int = PROFILE_CACHE_SIZE):
+        # user_id: "@username" или None — username нет
+        self._entries = TTLMap(ttl, maxsize=maxsize, clock=time.monotonic)
+        self._inflight: dict[int, asyncio.Future] = {}
+
+    def put(self, user_id: int, username: str | None, ttl: float | None = None):
+        self._entries.put(int(user_id), username, ttl)
+
+    def put_user(self, user):
+        username = _format(user)
+        found, cached = self.lookup(user.id)
+        if found and cached == username:
+            return  # то же имя и запись ещё свежая — не трогаем кэш на каждом апдейте
+        self.put(user.id, username)
+
+    def lookup(self, user_id: int) -> tuple[bool, str | None]:
+        """Без сети: (есть ли свежая запись, "@username" или None)."""
+        return self._entries.lookup(int(user_id), touch=True)
+
+    def get(self, user_id: int) -> str | None:
+        return self.lookup(user_id)[1]
+
+    def __contains__(self, user_id) -> bool:
+        return self.lookup(user_id)[0]
+
+    def expire(self) -> int:
+        return self._entries.expire()
+
+    async def fetch(self, bot, user_id: int) -> str | None:
+        """Username пользователя: из кэша, а при промахе — через get_chat (один запрос на всех ждущих)."""
+        user_id = int(user_id)
+        found, username = self.lookup(user_id)
+        if found:
+            return username
+
+        future = self._inflight.get(user_id)
+        if future is None:
+            future = self._inflight[user_id] = asyncio.ensure_future(self._load(bot, user_id))
+        return await asyncio.shield(future)
+
+    async def fetch_many(self, bot, user_ids) -> dict[int, str | None]:
+        user_ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+        names = await asyncio.gather(*(self.fetch(bot, uid) for uid in user_ids))
+        return dict(zip(user_ids, names, strict=True))
+
+    async def _load(self, bot, user_id: int) -> str | None:
+        try:
+            chat = await bot.get_chat(user_id)
+        except Exception as exc:
+            logger.warning(f"⚠️ get_chat({user_id}) не удался: {exc}")
+            self.put(user_id, None, ttl=FAILED_TTL)
+            return None
+        else:
+            username = _format(chat)
+            self.put(user_id, username)
+            return username
+        finally:
+            self._inflight.pop(user_id, None)
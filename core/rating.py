@@ -1,22 +1,32 @@
 # core/rating.py
 
-import json
-from config import RATING_FILE
-from core import globals
+from collections import deque
 
+from config import HISTORY_PER_USER, RATING_FILE
+from core import globals, history, leaderboard, rating_series, storage
+from core.rating_engine import DEFAULT_RATING, get_engine, team_state
+from core.sqlite_store import SqliteTable
 
+# Движок рейтинга (RATING_ENGINE из config.py)
+_engine = get_engine()
+
+
 def load_ratings():
-    try:
-        with open(RATING_FILE, 'r') as f:
-            globals.ratings = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.ratings = {}
-        save_ratings()
+    globals.ratings = storage.load_table(
+        "ratings",
+        columns={"rating": lambda data: data.get("rating", 1000)},
+    )
+    if isinstance(globals.ratings, SqliteTable):
+        leaderboard.rebuild(globals.ratings.column_items("rating"))
+    else:
+        leaderboard.rebuild((uid, data.get("rating", 1000)) for uid, data in globals.ratings.items())
 
 
 def save_ratings():
-    with open(RATING_FILE, 'w') as f:
-        json.dump(globals.ratings, f)
+    storage.mark_dirty("ratings")
+
+
+storage.register("ratings", RATING_FILE, lambda: globals.ratings, sqlite=True)
 
 
 def get_rating(user_id):
@@ -35,45 +45,58 @@ def get_profile(user_id):
     }
 
 
-def update_ratings(winners, losers):
-    deltas: dict[int, int] = {}
-
-    for uid in winners:
-        uid_str = str(uid)
-        if uid_str not in globals.ratings:
-            globals.ratings[uid_str] = {"rating": 1000, "wins": 0, "losses": 0}
-        before = globals.ratings[uid_str]["rating"]
-        globals.ratings[uid_str]["rating"] = before + 25
-        globals.ratings[uid_str]["wins"] += 1
-        deltas[int(uid)] = globals.ratings[uid_str]["rating"] - before
-
-    for uid in losers:
-        uid_str = str(uid)
-        if uid_str not in globals.ratings:
-            globals.ratings[uid_str] = {"rating": 1000, "wins": 0, "losses": 0}
-        before = globals.ratings[uid_str]["rating"]
-        globals.ratings[uid_str]["rating"] = max(0, before - 25)
-        globals.ratings[uid_str]["losses"] += 1
-        deltas[int(uid)] = globals.ratings[uid_str]["rating"] - before
-
-    save_ratings()
+def _record(uid_str):
+    if uid_str not in globals.ratings:
+        globals.ratings[uid_str] = {"rating": DEFAULT_RATING, "wins": 0, "losses": 0}
+    return globals.ratings[uid_str]
+
+
+def update_ratings(winners, losers):
+    """Пересчитывает рейтинги участников матча движком RATING_ENGINE.
+
+    Обе команды считаются одним матричным вызовом; возвращает {user_id: изменение}.
+    """
+    win_records = [_record(str(uid)) for uid in winners]
+    lose_records = [_record(str(uid)) for uid in losers]
+
+    new_win, new_lose = _engine.rate(team_state(_engine, win_records), team_state(_engine, lose_records))
+
+    deltas: dict[int, int] = {}
+    for uids, records, state, counter in (
+        (winners, win_records, new_win, "wins"),
+        (losers, lose_records, new_lose, "losses"),
+    ):
+        for i, (uid, record) in enumerate(zip(uids, records, strict=True)):
+            before = record.get("rating", DEFAULT_RATING)
+            record["rating"] = int(round(state["rating"][0, i]))
+            for field in _engine.fields[1:]:
+                record[field] = float(state[field][0, i])
+            record[counter] = record.get(counter, 0) + 1
+            deltas[int(uid)] = record["rating"] - before
+            leaderboard.update(str(uid), record["rating"])
+
+    rating_series.record(deltas, {int(uid): get_rating(uid) for uid in deltas})
+    save_ratings()
     return deltas
 
 
-MATCHES_FILE = "matches.json"
+def _index_match(match_id, data):
+    for pid in data.get("players", []):
+        ids = globals.match_index.get(int(pid))
+        if ids is None:
+            ids = globals.match_index[int(pid)] = deque(maxlen=HISTORY_PER_USER)
+        ids.append(match_id)
 
-def save_matches():
-    with open(MATCHES_FILE, "w") as f:
-        json.dump(globals.matches, f)
 
 def load_matches():
-    try:
-        with open(MATCHES_FILE, "r") as f:
-            globals.matches = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.matches = {}
-        save_matches()
+    history.open_log()
+    globals.matches = {}
+    globals.match_index = {}
+    for match_id, data in history.iter_records():
+        globals.matches[match_id] = data
+        _index_match(match_id, data)
 
 def add_match_history(match_id, data):
     globals.matches[match_id] = data
-    save_matches()
+    _index_match(match_id, data)
+    history.append(match_id, data)
@@ -0,0 +1,154 @@
+# core/rating_engine.py
+#
+# Движки рейтинга. Все считают матрично: состояние игроков — словарь
+# массивов формы (M, T) — M матчей по T игроков в команде, поэтому один
+# и тот же код обновляет и один финализированный матч, и пачку матчей
+# при пересчёте истории.
+#
+#   flat    — ±FLAT_STEP каждому, как было раньше;
+#   elo     — Elo с ожидаемым счётом против среднего рейтинга соперников;
+#   glicko2 — Glicko-2, соперник — «составной» игрок из команды противника.
+
+import numpy as np
+
+from config import ELO_K, GLICKO_TAU, RATING_ENGINE
+
+DEFAULT_RATING = 1000
+FLAT_STEP = 25
+
+# Поля записи игрока, которые хранит каждый движок, и их значения по умолчанию
+DEFAULTS = {"rating": DEFAULT_RATING, "rd": 350.0, "vol": 0.06}
+
+
+class FlatEngine:
+    name = "flat"
+    fields = ("rating",)
+
+    def rate(self, win: dict, lose: dict) -> tuple[dict, dict]:
+        return (
+            {"rating": win["rating"] + FLAT_STEP},
+            {"rating": np.maximum(lose["rating"] - FLAT_STEP, 0)},
+        )
+
+
+class EloEngine:
+    name = "elo"
+    fields = ("rating",)
+
+    def __init__(self, k: float = ELO_K):
+        self.k = k
+
+    def _delta(self, own: np.ndarray, opponents: np.ndarray, score: float) -> np.ndarray:
+        # Ожидаемый счёт каждого игрока против среднего рейтинга команды соперника
+        opp = opponents.mean(axis=1, keepdims=True)
+        expected = 1.0 / (1.0 + 10.0 ** ((opp - own) / 400.0))
+        return self.k * (score - expected)
+
+    def rate(self, win: dict, lose: dict) -> tuple[dict, dict]:
+        winners, losers = win["rating"], lose["rating"]
+        return (
+            {"rating": winners + self._delta(winners, losers, 1.0)},
+            {"rating": np.maximum(losers + self._delta(losers, winners, 0.0), 0)},
+        )
+
+
+class Glicko2Engine:
+    name = "glicko2"
+    fields = ("rating", "rd", "vol")
+
+    SCALE = 173.7178
+    CENTER = 1500.0
+    EPSILON = 1e-6
+    MAX_ITERATIONS = 100
+
+    def __init__(self, tau: float = GLICKO_TAU):
+        self.tau = tau
+
+    @staticmethod
+    def _g(phi):
+        return 1.0 / np.sqrt(1.0 + 3.0 * phi ** 2 / np.pi ** 2)
+
+    def _volatility(self, phi, sigma, delta, v):
+        """Новая волатильность (итерация Illinois из статьи Glickman'а), поэлементно."""
+        tau2 = self.tau ** 2
+        alpha = np.log(sigma ** 2)
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - alpha) / tau2
+
+        a = alpha
+        big = delta ** 2 > phi ** 2 + v
+        # Без «big» отступаем от a шагами tau, пока f не станет неотрицательной
+        k = np.ones_like(a)
+        need = ~big & (f(a - k * self.tau) < 0)
+        for _ in range(self.MAX_ITERATIONS):
+            if not need.any():
+                break
+            k = np.where(need, k + 1, k)
+            need = need & (f(a - k * self.tau) < 0)
+        b = np.where(big, np.log(np.maximum(delta ** 2 - phi ** 2 - v, 1e-300)), a - k * self.tau)
+
+        fa, fb = f(a), f(b)
+        for _ in range(self.MAX_ITERATIONS):
+            active = np.abs(b - a) > self.EPSILON
+            if not active.any():
+                break
+            c = a + (a - b) * fa / (fb - fa)
+            fc = f(c)
+            swap = fc * fb <= 0
+            a = np.where(active, np.where(swap, b, a), a)
+            fa = np.where(active, np.where(swap, fb, fa / 2), fa)
+            b = np.where(active, c, b)
+            fb = np.where(active, fc, fb)
+        return np.exp(a / 2)
+
+    def _update(self, own: dict, opp: dict, score: float) -> dict:
+        mu = (own["rating"] - self.CENTER) / self.SCALE
+        phi = own["rd"] / self.SCALE
+        sigma = own["vol"]
+
+        # Команда соперника как один игрок: средний μ, среднеквадратичный φ
+        mu_j = ((opp["rating"] - self.CENTER) / self.SCALE).mean(axis=1, keepdims=True)
+        phi_j = np.sqrt(((opp["rd"] / self.SCALE) ** 2).mean(axis=1, keepdims=True))
+
+        g = self._g(phi_j)
+        expected = 1.0 / (1.0 + np.exp(-g * (mu - mu_j)))
+        v = 1.0 / (g ** 2 * expected * (1 - expected))
+        delta = v * g * (score - expected)
+
+        new_sigma = self._volatility(phi, sigma, delta, v)
+        phi_star = np.sqrt(phi ** 2 + new_sigma ** 2)
+        new_phi = 1.0 / np.sqrt(1.0 / phi_star ** 2 + 1.0 / v)
+        new_mu = mu + new_phi ** 2 * g * (score - expected)
+
+        return {
+            "rating": np.maximum(new_mu * self.SCALE + self.CENTER, 0),
+            "rd": new_phi * self.SCALE,
+            "vol": new_sigma,
+        }
+
+    def rate(self, win: dict, lose: dict) -> tuple[dict, dict]:
+        return self._update(win, lose, 1.0), self._update(lose, win, 0.0)
+
+
+ENGINES = {
+    "flat": FlatEngine,
+    "elo": EloEngine,
+    "glicko2": Glicko2Engine,
+}
+
+
+def get_engine(name: str = RATING_ENGINE):
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown rating engine: {name}") from None
+
+
+def team_state(engine, records: list[dict]) -> dict[str, np.ndarray]:
+    """Состояние одной команды в виде массивов формы (1, T)."""
+    return {
+        field: np.array([[record.get(field, DEFAULTS[field]) for record in records]], dtype=np.float64)
+        for field in engine.fields
+    }
@@ -0,0 +1,113 @@
+# core/rating_series.py
+#
+# История рейтинга каждого игрока: каждое изменение из update_ratings —
+# запись фиксированного размера (uid, время, рейтинг, изменение) в бинарном
+# файле только на дозапись. При загрузке файл читается через mmap и
+# раскладывается по игрокам в компактные массивы — 12 байт на точку.
+
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from config import RATING_SERIES_FILE
+from core import storage
+
+logger = logging.getLogger(__name__)
+
+# Формат записи на диске (little-endian, без выравнивания — 20 байт)
+RECORD = np.dtype([("uid", "<i8"), ("ts", "<u4"), ("rating", "<i4"), ("delta", "<i4")])
+
+
+class Series:
+    """Точки одного игрока в порядке времени."""
+
+    __slots__ = ("ts", "rating", "delta")
+
+    def __init__(self):
+        self.ts = array("I")
+        self.rating = array("i")
+        self.delta = array("i")
+
+    def __len__(self):
+        return len(self.ts)
+
+    def points(self, start: int, stop: int) -> list[tuple[int, int, int]]:
+        return list(zip(self.ts[start:stop], self.rating[start:stop], self.delta[start:stop], strict=True))
+
+
+# user_id → Series
+_series: dict[int, Series] = {}
+
+
+def load_series():
+    """Читает журнал через mmap и раскладывает записи по игрокам."""
+    _series.clear()
+    try:
+        size = os.path.getsize(RATING_SERIES_FILE)
+    except FileNotFoundError:
+        return
+
+    tail = size % RECORD.itemsize
+    if tail:
+        # Недописанная запись после падения — отрезаем
+        with open(RATING_SERIES_FILE, "rb+") as f:
+            f.truncate(size - tail)
+        logger.warning(f"✂️ Обрезан повреждённый хвост {RATING_SERIES_FILE}")
+    count = size // RECORD.itemsize
+    if not count:
+        return
+
+    records = np.memmap(RATING_SERIES_FILE, dtype=RECORD, mode="r", shape=(count,))
+    # Стабильная сортировка по uid сохраняет порядок записи (а значит, и времени)
+    order = np.argsort(records["uid"], kind="stable")
+    uids = records["uid"][order]
+    bounds = np.flatnonzero(uids[1:] != uids[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [count]))
+    ts, rating, delta = records["ts"][order], records["rating"][order], records["delta"][order]
+
+    for start, end in zip(starts.tolist(), ends.tolist(), strict=True):
+        series = _series[int(uids[start])] = Series()
+        series.ts.frombytes(ts[start:end].astype("<u4").tobytes())
+        series.rating.frombytes(rating[start:end].astype("<i4").tobytes())
+        series.delta.frombytes(delta[start:end].astype("<i4").tobytes())
+    del records
+
+
+def record(changes: dict[int, int], ratings: dict[int, int], ts: float | None = None):
+    """Добавляет точки по итогам матча: changes — {user_id: изменение}, ratings — {user_id: новый рейтинг}.
+
+    Все точки матча уходят на диск одной дозаписью через поток-писатель.
+    """
+    ts = int(time.time() if ts is None else ts)
+    rows = np.zeros(len(changes), dtype=RECORD)
+    for i, (uid, delta) in enumerate(changes.items()):
+        uid = int(uid)
+        rows[i] = (uid, ts, ratings[uid], delta)
+        series = _series.get(uid)
+        if series is None:
+            series = _series[uid] = Series()
+        series.ts.append(ts)
+        series.rating.append(ratings[uid])
+        series.delta.append(delta)
+    storage.submit(storage.append_bytes, RATING_SERIES_FILE, rows.tobytes())
+
+
+def last(user_id, n: int) -> list[tuple[int, int, int]]:
+    """Последние n точек игрока: [(время, рейтинг, изменение), ...] от старых к новым."""
+    series = _series.get(int(user_id))
+    if series is None or n <= 0:
+        return []
+    return series.points(max(0, len(series) - n), len(series))
+
+
+def between(user_id, start_ts: float, end_ts: float) -> list[tuple[int, int, int]]:
+    """Точки игрока со временем в [start_ts, end_ts]."""
+    series = _series.get(int(user_id))
+    if series is None:
+        return []
+    return series.points(bisect_left(series.ts, start_ts), bisect_right(series.ts, end_ts))
@@ -0,0 +1,333 @@
+# core/sqlite_store.py
+#
+# SQLite-хранилище для больших инсталляций (STORAGE_BACKEND=sqlite).
+# Таблица выглядит для остального кода как обычный dict (user_id: запись),
+# но в памяти держит только ограниченный LRU-кэш, а на диск пишет
+# только реально изменившиеся строки — одной транзакцией на flush.
+
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from config import SQLITE_CACHE_SIZE, SQLITE_FILE
+
+logger = logging.getLogger(__name__)
+
+_connection: sqlite3.Connection | None = None
+_writer_connection: sqlite3.Connection | None = None
+
+
+def _connect(**kwargs) -> sqlite3.Connection:
+    conn = sqlite3.connect(SQLITE_FILE, isolation_level=None, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Соединение для чтения из event loop."""
+    global _connection
+    if _connection is None:
+        _connection = _connect()
+    return _connection
+
+
+def get_writer_connection() -> sqlite3.Connection:
+    """Отдельное соединение для потока-писателя (WAL позволяет читать параллельно)."""
+    global _writer_connection
+    if _writer_connection is None:
+        _writer_connection = _connect(check_same_thread=False)
+    return _writer_connection
+
+
+class SqliteTable(MutableMapping):
+    """dict-подобная таблица key → JSON с построчной записью изменений.
+
+    Вложенные записи можно менять на месте (globals.ratings[uid]["rating"] += 25):
+    все ключи, прочитанные с прошлого flush(), сверяются с сохранённой версией,
+    и в транзакцию попадают только отличающиеся строки.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, name: str, columns: dict | None = None,
+                 cache_size: int = SQLITE_CACHE_SIZE):
+        self.conn = conn
+        self.name = name
+        self.columns = columns or {}
+        self.cache_size = cache_size
+
+        self._cache: OrderedDict[str, object] = OrderedDict()
+        self._stored: dict[str, str | None] = {}  # key: JSON, который сейчас лежит в базе
+        self._touched: set[str] = set()
+        self._deleted: set[str] = set()
+        # Строки, чью запись нужно повторить, даже если кэш совпадает с _stored
+        self._retry: set[str] = set()
+
+        # Строки, отданные потоку-писателю, но ещё не закоммиченные (key: JSON или None — удаление)
+        self._inflight: dict[str, str | None] = {}
+        self._inflight_lock = threading.Lock()
+
+        extra = "".join(f", {col} INTEGER" for col in self.columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, data TEXT NOT NULL{extra})")
+        for col in self.columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_{col} ON {name} ({col})")
+
+    # --- кэш ---
+
+    def _remember(self, key: str, value, stored: str | None):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        self._stored[key] = stored
+        self._touched.add(key)
+        self._evict()
+
+    def _is_clean(self, key: str) -> bool:
+        """Совпадает ли запись в кэше с версией в базе (её можно вытеснить без записи)."""
+        stored = self._stored.get(key)
+        return stored is not None and key not in self._retry and json.dumps(self._cache[key], ensure_ascii=False) == stored
+
+    def _evict(self):
+        # Вытесняем самые старые записи, кроме реально изменённых с прошлого flush().
+        # Прочитанные ключи тоже попадают в _touched (запись могли поменять на месте),
+        # поэтому их сверяем со снимком из базы — иначе чтения раздували бы кэш.
+        excess = len(self._cache) - self.cache_size
+        victims = []
+        for key in self._cache:
+            if excess <= 0:
+                break
+            if key in self._touched:
+                if not self._is_clean(key):
+                    continue
+                self._touched.discard(key)
+            victims.append(key)
+            excess -= 1
+        for key in victims:
+            del self._cache[key]
+            del self._stored[key]
+
+    def _load(self, key: str):
+        data = self._fetch_raw(key)
+        if data is None:
+            raise KeyError(key)
+        value = json.loads(data)
+        self._remember(key, value, data)
+        return value
+
+    # --- интерфейс dict ---
+
+    def __getitem__(self, key):
+        key = str(key)
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._touched.add(key)
+            return self._cache[key]
+        return self._load(key)
+
+    def __setitem__(self, key, value):
+        key = str(key)
+        self._deleted.discard(key)
+        stored = self._stored.get(key) if key in self._cache else self._fetch_raw(key)
+        self._remember(key, value, stored)
+
+    def __delitem__(self, key):
+        key = str(key)
+        if key not in self:
+            raise KeyError(key)
+        is_new = key in self._cache and self._stored.get(key) is None
+        self._cache.pop(key, None)
+        self._stored.pop(key, None)
+        self._touched.discard(key)
+        if not is_new:
+            self._deleted.add(key)
+
+    def __contains__(self, key):
+        key = str(key)
+        if key in self._deleted:
+            return False
+        return key in self._cache or self._fetch_raw(key) is not None
+
+    def _fetch_raw(self, key: str) -> str | None:
+        with self._inflight_lock:
+            if key in self._inflight:
+                return self._inflight[key]
+        return self._select(key)
+
+    def _select(self, key: str) -> str | None:
+        row = self.conn.execute(f"SELECT data FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _overlay(self) -> tuple[dict[str, str | None], set[str]]:
+        """Что ещё не видно в базе: новые/изменённые строки и удалённые ключи."""
+        with self._inflight_lock:
+            changed = {key: data for key, data in self._inflight.items() if data is not None}
+            hidden = {key for key, data in self._inflight.items() if data is None}
+        for key in self._cache:
+            if self._stored.get(key) is None:
+                changed[key] = None
+        hidden |= self._deleted
+        hidden -= changed.keys()
+        return changed, hidden
+
+    def __iter__(self):
+        changed, hidden = self._overlay()
+        yield from changed
+        for (key,) in self.conn.execute(f"SELECT key FROM {self.name}"):
+            if key not in hidden and key not in changed:
+                yield key
+
+    def __len__(self):
+        (count,) = self.conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+        changed, hidden = self._overlay()
+        count += sum(1 for key in changed if self._select(key) is None)
+        count -= sum(1 for key in hidden if self._select(key) is not None)
+        return count
+
+    def items(self):
+        """Потоковый обход без загрузки всей таблицы в кэш."""
+        changed, hidden = self._overlay()
+        for key, data in changed.items():
+            yield key, self._cache[key] if key in self._cache else json.loads(data)
+        for key, data in self.conn.execute(f"SELECT key, data FROM {self.name}"):
+            if key in hidden or key in changed:
+                continue
+            yield key, self._cache[key] if key in self._cache else json.loads(data)
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def column_items(self, column: str):
+        """Потоковый обход (key, значение колонки) без разбора JSON строк базы."""
+        getter = self.columns[column]
+        changed, hidden = self._overlay()
+        for key, data in changed.items():
+            yield key, getter(self._cache[key] if key in self._cache else json.loads(data))
+        for key, value in self.conn.execute(f"SELECT key, {column} FROM {self.name}"):
+            if key in hidden or key in changed:
+                continue
+            yield key, value
+
+    # --- запись ---
+
+    def pending_changes(self) -> tuple[list[tuple], list[tuple]]:
+        """Собирает изменённые строки с прошлого flush() и сбрасывает отметки.
+
+        Вызывается в event loop; результат — неизменяемый снимок для write().
+        """
+        upserts = []
+        for key in self._touched:
+            if key not in self._cache:
+                continue
+            value = self._cache[key]
+            data = json.dumps(value, ensure_ascii=False)
+            if data == self._stored.get(key) and key not in self._retry:
+                continue
+            extra = tuple(getter(value) for getter in self.columns.values())
+            upserts.append((key, data, *extra))
+            self._stored[key] = data
+
+        deletes = [(key,) for key in self._deleted]
+        with self._inflight_lock:
+            for key, data, *_ in upserts:
+                self._inflight[key] = data
+            for (key,) in deletes:
+                self._inflight[key] = None
+
+        self._touched.clear()
+        self._deleted.clear()
+        self._retry.clear()
+        self._evict()
+        return upserts, deletes
+
+    def restore(self, upserts: list[tuple], deletes: list[tuple]):
+        """Возвращает в очередь на запись снимок, который не удалось записать (в event loop).
+
+        Строки остаются в _inflight (чтения видят их), пока следующий снимок их не заменит.
+        """
+        with self._inflight_lock:
+            pending = dict(self._inflight)
+        for key, data, *_ in upserts:
+            if pending.get(key) != data or key in self._deleted:
+                continue  # с тех пор строку изменили или удалили — её запишет новый снимок
+            if key not in self._cache:
+                self._cache[key] = json.loads(data)
+                self._stored[key] = data
+            self._touched.add(key)
+            self._retry.add(key)
+        for (key,) in deletes:
+            if key in pending and pending[key] is None and key not in self._cache:
+                self._deleted.add(key)
+
+    def write(self, upserts: list[tuple], deletes: list[tuple]):
+        """Применяет снимок одной транзакцией (в потоке-писателе)."""
+        write_many([(self, upserts, deletes)])
+
+    def _execute(self, conn: sqlite3.Connection, upserts: list[tuple], deletes: list[tuple]):
+        cols = ", ".join(["key", "data", *self.columns])
+        marks = ", ".join("?" * (2 + len(self.columns)))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in ["data", *self.columns])
+        if upserts:
+            conn.executemany(
+                f"INSERT INTO {self.name} ({cols}) VALUES ({marks}) "
+                f"ON CONFLICT(key) DO UPDATE SET {updates}",
+                upserts,
+            )
+        if deletes:
+            conn.executemany(f"DELETE FROM {self.name} WHERE key = ?", deletes)
+
+    def _written(self, upserts: list[tuple], deletes: list[tuple]):
+        # Строки в базе — снимаем их с учёта, если их не успели изменить снова
+        with self._inflight_lock:
+            for key, data, *_ in upserts:
+                if self._inflight.get(key) == data:
+                    del self._inflight[key]
+            for (key,) in deletes:
+                if key in self._inflight and self._inflight[key] is None:
+                    del self._inflight[key]
+
+    def flush(self):
+        self.write(*self.pending_changes())
+
+    def import_dict(self, data: dict):
+        for key, value in data.items():
+            self[key] = value
+        self.flush()
+
+
+def write_many(changes: list[tuple[SqliteTable, list[tuple], list[tuple]]]):
+    """Записывает снимки нескольких таблиц одной транзакцией (в потоке-писателе)."""
+    changes = [(table, upserts, deletes) for table, upserts, deletes in changes if upserts or deletes]
+    if not changes:
+        return
+    conn = get_writer_connection()
+    with conn:
+        conn.execute("BEGIN")
+        for table, upserts, deletes in changes:
+            table._execute(conn, upserts, deletes)
+    for table, upserts, deletes in changes:
+        table._written(upserts, deletes)
+
+
+def open_table(name: str, legacy_file: str | None = None, columns: dict | None = None) -> SqliteTable:
+    """Открывает таблицу; при первом запуске переносит в неё данные из JSON-файла."""
+    conn = get_connection()
+    is_new = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is None
+    table = SqliteTable(conn, name, columns)
+
+    if is_new and legacy_file:
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            legacy = {}
+        if legacy:
+            table.import_dict(legacy)
+            logger.info(f"📦 {name}: перенесено {len(legacy)} записей из {legacy_file}")
+
+    return table
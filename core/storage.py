@@ -0,0 +1,257 @@
+# core/storage.py
+#
+# Отложенная запись на диск. Обработчики только помечают коллекции
+# изменёнными; периодический flush() снимает с них снимки и отдаёт
+# их единственному фоновому потоку-писателю, который и трогает диск.
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from config import SAVE_INTERVAL, STORAGE_BACKEND
+from core.sqlite_store import SqliteTable, open_table, write_many
+
+logger = logging.getLogger(__name__)
+
+# 📦 Зарегистрированные коллекции (имя: путь к файлу, геттер данных, параметры json.dump)
+_collections: dict[str, dict] = {}
+
+# ✏️ Коллекции, изменённые с момента последней записи
+_dirty: set[str] = set()
+
+# 🧵 Очередь задач потока-писателя: (функция, аргументы) или None для остановки
+_tasks: queue.Queue = queue.Queue()
+_writer: threading.Thread | None = None
+
+# 📦 Задачи записи, накопленные внутри batch() (None — пакет не открыт)
+_batch: list[tuple] | None = None
+
+# ♻️ Снимки коллекций, которые не удалось записать (name, fn, args) — из потока-писателя;
+# flush() возвращает их в _dirty, чтобы следующая запись повторила попытку
+_failed: queue.SimpleQueue = queue.SimpleQueue()
+
+WRITE_RETRIES = 3
+
+
+def register(name: str, path: str, getter, *, sqlite: bool = False, **dump_kwargs):
+    """Регистрирует коллекцию, которую нужно периодически сбрасывать на диск.
+
+    sqlite=True — коллекцию можно держать в SQLite вместо JSON-файла.
+    """
+    _collections[name] = {
+        "path": path,
+        "getter": getter,
+        "sqlite": sqlite,
+        "dump_kwargs": dump_kwargs,
+    }
+
+
+def mark_dirty(name: str):
+    """Помечает коллекцию изменённой — запись произойдёт при ближайшем flush()."""
+    if name not in _collections:
+        raise KeyError(f"Unknown storage collection: {name}")
+    _dirty.add(name)
+
+
+def is_dirty(name: str) -> bool:
+    return name in _dirty
+
+
+def load_table(name: str, columns: dict | None = None):
+    """Загружает коллекцию: JSON-файл целиком или SQLite-таблицу (STORAGE_BACKEND=sqlite)."""
+    spec = _collections[name]
+    if STORAGE_BACKEND == "sqlite" and spec["sqlite"]:
+        return open_table(name, legacy_file=spec["path"], columns=columns)
+
+    try:
+        with open(spec["path"], "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        mark_dirty(name)
+        return {}
+
+
+# --- поток-писатель ---
+
+def atomic_write(path: str, payload: bytes):
+    """Пишет файл целиком через временный файл и rename — без полузаписанных JSON."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_bytes(path: str, payload: bytes):
+    with open(path, "ab") as f:
+        f.write(payload)
+
+
+def _rollback_append(path: str):
+    """Запоминает размер файла до дозаписи и возвращает функцию, обрезающую файл обратно."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        size = 0
+
+    def rollback():
+        if os.path.exists(path):
+            os.truncate(path, size)
+    return rollback
+
+
+def _run(fn, args) -> bool:
+    """Выполняет запись с повторами; False — не удалось и после WRITE_RETRIES попыток."""
+    # Недописанный хвост дозаписи обрезается перед повтором — иначе журнал задвоится или побьётся
+    rollback = _rollback_append(args[0]) if fn is append_bytes else None
+    for attempt in range(1, WRITE_RETRIES + 1):
+        try:
+            fn(*args)
+            return True
+        except Exception:
+            if attempt == WRITE_RETRIES:
+                logger.exception(f"❌ Запись {getattr(fn, '__qualname__', fn)} не удалась")
+            else:
+                time.sleep(0.1 * attempt)
+            if rollback is not None:
+                try:
+                    rollback()
+                except OSError:
+                    logger.exception(f"❌ Не удалось откатить дозапись в {args[0]}")
+    return False
+
+
+def _write_collection(name: str, fn, args):
+    if not _run(fn, args):
+        _failed.put((name, fn, args))
+
+
+def _requeue_failed():
+    """Возвращает неудавшиеся записи коллекций в _dirty (в event loop)."""
+    while True:
+        try:
+            name, fn, args = _failed.get_nowait()
+        except queue.Empty:
+            return
+        if getattr(fn, "__func__", None) is SqliteTable.write:
+            fn.__self__.restore(*args)
+        _dirty.add(name)
+
+
+def _writer_loop():
+    while True:
+        task = _tasks.get()
+        try:
+            if task is None:
+                return
+            _run(*task)
+        finally:
+            _tasks.task_done()
+
+
+def submit(fn, *args):
+    """Отдаёт запись потоку-писателю; до его запуска выполняет её сразу."""
+    if _batch is not None:
+        _batch.append((fn, args))
+    elif _writer is None:
+        _run(fn, args)
+    else:
+        _tasks.put((fn, args))
+
+
+def _snapshot(name: str):
+    """Снимает неизменяемый снимок коллекции (в event loop) и возвращает задачу записи."""
+    spec = _collections[name]
+    data = spec["getter"]()
+    if isinstance(data, SqliteTable):
+        return data.write, data.pending_changes()
+    payload = json.dumps(data, **spec["dump_kwargs"]).encode()
+    return atomic_write, (spec["path"], payload)
+
+
+def _write_batch(tasks: list[tuple], snapshots: list[tuple]):
+    """Выполняет пакет в потоке-писателе: дозаписи и JSON-файлы по порядку,
+    все SQLite-таблицы — одной общей транзакцией."""
+    for fn, args in tasks:
+        _run(fn, args)
+    tables = []
+    for name, fn, args in snapshots:
+        if getattr(fn, "__func__", None) is SqliteTable.write:
+            tables.append((name, fn, args))
+        else:
+            _write_collection(name, fn, args)
+    if tables and not _run(write_many, ([(fn.__self__, *args) for _, fn, args in tables],)):
+        for task in tables:
+            _failed.put(task)
+
+
+@contextmanager
+def batch():
+    """Все изменения внутри блока уходят на диск одной задачей потока-писателя.
+
+    Дозаписи журналов (submit) копятся, а на выходе к ним добавляются снимки
+    всех изменённых коллекций — без ожидания периодического flush().
+    """
+    global _batch
+    if _batch is not None:
+        yield  # вложенный пакет — часть внешнего
+        return
+
+    _batch = []
+    try:
+        yield
+    finally:
+        tasks, _batch = _batch, None
+        snapshots = []
+        _requeue_failed()
+        while _dirty:
+            name = _dirty.pop()
+            try:
+                snapshots.append((name, *_snapshot(name)))
+            except Exception:
+                logger.exception(f"❌ Не удалось подготовить {name} к сохранению")
+        if tasks or snapshots:
+            submit(_write_batch, tasks, snapshots)
+
+
+def flush():
+    """Ставит в очередь запись всех изменённых коллекций — по одной на коллекцию."""
+    _requeue_failed()
+    while _dirty:
+        name = _dirty.pop()
+        try:
+            fn, args = _snapshot(name)
+        except Exception:
+            logger.exception(f"❌ Не удалось подготовить {name} к сохранению")
+            continue
+        submit(_write_collection, name, fn, args)
+
+
+async def flush_job(_context):
+    flush()
+
+
+def start(job_queue):
+    """Запускает поток-писатель и периодический сброс изменений на диск."""
+    global _writer
+    if _writer is None:
+        _writer = threading.Thread(target=_writer_loop, name="storage-writer", daemon=True)
+        _writer.start()
+    job_queue.run_repeating(flush_job, interval=SAVE_INTERVAL, first=SAVE_INTERVAL)
+
+
+def shutdown():
+    """Сбрасывает всё несохранённое и дожидается окончания записи."""
+    global _writer
+    flush()
+    if _writer is not None:
+        _tasks.put(None)
+        _writer.join()
+        _writer = None
+        # Последняя попытка для того, что не удалось записать в потоке-писателе
+        flush()
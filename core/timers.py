@@ -0,0 +1,136 @@
+# core/timers.py
+#
+# Иерархическое колесо таймеров для массовых отложенных событий
+# (напоминания о поиске, автоподтверждение результатов).
+# Вместо отдельной задачи JobQueue на каждого игрока/матч — одна
+# периодическая задача, которая раз в TICK секунд пачкой запускает
+# всё, что наступило. Постановка и отмена — O(1).
+
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+TICK = 1.0        # разрешение колеса, сек
+SLOTS = 64        # слотов на уровне
+LEVELS = 3        # 64 с, ~68 мин, ~3 суток; что дальше — в overflow
+
+
+class _Timer:
+    __slots__ = ("key", "expires", "callback", "data", "interval")
+
+    def __init__(self, key, expires: int, callback, data, interval: float | None):
+        self.key = key
+        self.expires = expires
+        self.callback = callback
+        self.data = data
+        self.interval = interval
+
+
+class TimerWheel:
+    def __init__(self, tick: float = TICK, slots: int = SLOTS, levels: int = LEVELS):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+
+        self._wheel = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._overflow: dict = {}
+        self._due: dict = {}
+        # key → словарь (слот/overflow/due), в котором сейчас лежит таймер
+        self._where: dict = {}
+        self._current = math.floor(time.time() / tick)
+
+    def schedule(self, key, when: float, callback, data=None, interval: float | None = None):
+        """Ставит таймер на момент when (unix time); повторная постановка с тем же key заменяет его.
+
+        interval — повторять каждые interval секунд после срабатывания.
+        callback — корутина callback(context, data).
+        """
+        self.cancel(key)
+        self._insert(_Timer(key, math.ceil(when / self.tick), callback, data, interval))
+
+    def cancel(self, key) -> bool:
+        bucket = self._where.pop(key, None)
+        if bucket is None:
+            return False
+        del bucket[key]
+        return True
+
+    def __contains__(self, key) -> bool:
+        return key in self._where
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _insert(self, timer: _Timer):
+        if timer.expires <= self._current:
+            bucket = self._due
+        else:
+            bucket = self._overflow
+            span = 1
+            for level in range(self.levels):
+                # Уровень подходит, если до слота таймера меньше одного оборота
+                if timer.expires // span - self._current // span < self.slots:
+                    bucket = self._wheel[level][(timer.expires // span) % self.slots]
+                    break
+                span *= self.slots
+        bucket[timer.key] = timer
+        self._where[timer.key] = bucket
+
+    def _take(self, bucket: dict) -> list[_Timer]:
+        timers = list(bucket.values())
+        bucket.clear()
+        for timer in timers:
+            del self._where[timer.key]
+        return timers
+
+    def advance(self, now: float) -> list[_Timer]:
+        """Прокручивает колесо до now и возвращает наступившие таймеры."""
+        target = math.floor(now / self.tick)
+        fired = self._take(self._due)
+
+        while self._current < target:
+            self._current += 1
+
+            # Сверху вниз: дальние таймеры спускаются на уровни точнее
+            if self._current % self.slots ** self.levels == 0:
+                for timer in self._take(self._overflow):
+                    self._insert(timer)
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._current % span == 0:
+                    for timer in self._take(self._wheel[level][(self._current // span) % self.slots]):
+                        self._insert(timer)
+
+            fired.extend(self._take(self._wheel[0][self._current % self.slots]))
+            fired.extend(self._take(self._due))
+
+        # Повторяющиеся таймеры возвращаем в колесо до запуска колбэков,
+        # чтобы колбэк мог их отменить
+        for timer in fired:
+            if timer.interval and timer.key not in self._where:
+                timer.expires = math.ceil((now + timer.interval) / self.tick)
+                self._insert(timer)
+        return fired
+
+
+async def _run(timer: _Timer, context):
+    try:
+        await timer.callback(context, timer.data)
+    except Exception:
+        logger.exception(f"❌ Ошибка в таймере {timer.key}")
+
+
+def make_tick_job(wheel: TimerWheel):
+    async def tick_job(context):
+        # Колбэки запускаются отдельными задачами и не ждутся: долгий колбэк
+        # (финализация матча с рассылкой) не должен задерживать следующие тики
+        for timer in wheel.advance(time.time()):
+            context.application.create_task(_run(timer, context))
+    return tick_job
+
+
+def start(wheel: TimerWheel, job_queue):
+    """Запускает единственную периодическую задачу, которая крутит колесо."""
+    job_queue.run_repeating(make_tick_job(wheel), interval=wheel.tick, first=wheel.tick)
@@ -1,51 +1,159 @@
 # core/trust.py
+#
+# Траст-фактор на журнале событий. Каждое событие (жалоба, AFK, честный
+# матч) — запись (время, user_id, вид) в бинарном файле только на дозапись.
+# У игрока хранится накопленный «баланс» событий на момент balance_ts;
+# старые события затухают с периодом полураспада TRUST_HALF_LIFE, и
+# затухание считается при чтении, без периодических проходов по всем.
+#
+# События копятся в памяти и фиксируются пачкой через commit(): одна
+# дозапись журнала и одна пометка trust.json на весь матч.
 
+import os
 import time
-import json
-from config import TRUST_FILE
-from core import globals
 
+import numpy as np
 
-def load_trust():
-    try:
-        with open(TRUST_FILE, 'r') as f:
-            globals.trust_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.trust_data = {}
-        save_trust()
+from config import TRUST_EVENT_FILE, TRUST_FILE, TRUST_HALF_LIFE
+from core import globals, storage
 
+# Формат записи журнала (little-endian, без выравнивания — 13 байт)
+EVENT = np.dtype([("ts", "<u4"), ("uid", "<i8"), ("kind", "u1")])
 
-def save_trust():
-    with open(TRUST_FILE, 'w') as f:
-        json.dump(globals.trust_data, f)
+# Виды событий: (счётчик в профиле, вклад в траст, причина для уведомления)
+REPORT, AFK, CLEAN = 0, 1, 2
+KINDS = {
+    REPORT: ("reports", -2, "получен репорт"),
+    AFK: ("afk", -4, "AFK или отказ от участия в матче"),
+    CLEAN: ("confirmed_matches", 3, "честное участие в матчах"),
+}
+WEIGHTS = np.array([KINDS[kind][1] for kind in sorted(KINDS)], dtype=np.float64)
 
+BASE_SCORE = 100
 
-async def recalculate_trust_score(user_id, context=None, reason=None):
-    uid = str(user_id)
-    user_trust = globals.trust_data.get(uid, {
+# События, ещё не записанные в журнал, и затронутые ими игроки (uid: последняя причина)
+_pending: list[tuple[int, int, int]] = []
+_touched: dict[str, str] = {}
+
+
+def _new_record() -> dict:
+    return {
         "reports": 0,
         "confirmed_matches": 0,
         "afk": 0,
-        "trust_score": 100
-    })
+        "trust_score": BASE_SCORE,
+    }
 
-    previous_score = user_trust.get("trust_score", 100)
 
-    score = 100
-    score -= user_trust["reports"] * 2
-    score -= user_trust["afk"] * 4
-    score += user_trust["confirmed_matches"] * 3
-    score = max(0, min(score, 100))
+def _decay(age: float) -> float:
+    return 0.5 ** (max(age, 0) / TRUST_HALF_LIFE)
+
+
+def _balance(data: dict, now: float) -> float:
+    """Баланс событий игрока на момент now."""
+    if "balance" not in data:
+        # Запись из старого trust.json: счётчики без затухания
+        return sum(data.get(field, 0) * weight for field, weight, _ in KINDS.values())
+    return data["balance"] * _decay(now - data.get("balance_ts", now))
+
+
+def _score(balance: float) -> int:
+    return max(0, min(int(round(BASE_SCORE + balance)), BASE_SCORE))
+
+
+def load_trust():
+    globals.trust_data = storage.load_table("trust")
+    if not len(globals.trust_data):
+        rebuild_from_log()
+
+
+def save_trust():
+    storage.mark_dirty("trust")
+
+
+storage.register("trust", TRUST_FILE, lambda: globals.trust_data, sqlite=True)
 
-    user_trust["trust_score"] = score
-    globals.trust_data[uid] = user_trust
-    save_trust()
 
-    if context and score != previous_score:
-        try:
+def get_trust_score(user_id, now=None) -> int:
+    data = globals.trust_data.get(str(user_id))
+    if not data:
+        return BASE_SCORE
+    return _score(_balance(data, time.time() if now is None else now))
+
+
+def record_event(user_id, kind: int, now=None):
+    """Учитывает событие в памяти; на диск оно попадёт при commit()."""
+    now = int(time.time() if now is None else now)
+    uid = str(user_id)
+    field, weight, reason = KINDS[kind]
+
+    data = globals.trust_data.get(uid) or _new_record()
+    data["balance"] = _balance(data, now) + weight
+    data[field] = data.get(field, 0) + 1
+    data["balance_ts"] = now
+    globals.trust_data[uid] = data
+
+    _pending.append((now, int(user_id), kind))
+    _touched[uid] = reason
+
+
+def commit(context=None):
+    """Фиксирует накопленные события: пересчитывает траст затронутых игроков,
+    дописывает журнал одной записью и помечает trust.json один раз."""
+    if not _pending:
+        return
+    now = time.time()
+    events = np.array(_pending, dtype=EVENT)
+    touched = dict(_touched)
+    _pending.clear()
+    _touched.clear()
+
+    storage.submit(storage.append_bytes, TRUST_EVENT_FILE, events.tobytes())
+
+    for uid, reason in touched.items():
+        data = globals.trust_data[uid]
+        previous_score = data.get("trust_score", BASE_SCORE)
+        score = _score(_balance(data, now))
+        data["trust_score"] = score
+        globals.trust_data[uid] = data
+
+        if context and score != previous_score:
             msg = f"⚠️ Ваш траст-фактор изменился: {previous_score} → {score}"
             if reason:
                 msg += f"\nПричина: {reason}"
-            await context.bot.send_message(user_id, msg)
-        except Exception:
-            pass  # Игнорируем ошибки при отправке
+            # Уведомление некритичное — ставим в очередь с низким приоритетом и не ждём
+            globals.outbox.post(context.bot, int(uid), msg)
+    save_trust()
+
+
+def rebuild_from_log(now=None):
+    """Восстанавливает траст всех игроков по журналу событий (если trust.json потерян)."""
+    try:
+        size = os.path.getsize(TRUST_EVENT_FILE)
+    except FileNotFoundError:
+        return
+    count = size // EVENT.itemsize
+    if not count:
+        return
+
+    now = time.time() if now is None else now
+    events = np.memmap(TRUST_EVENT_FILE, dtype=EVENT, mode="r", shape=(count,))
+    uids, inverse = np.unique(events["uid"], return_inverse=True)
+    kinds = events["kind"].astype(np.int64)
+
+    counts = np.zeros((len(uids), len(KINDS)), dtype=np.int64)
+    np.add.at(counts, (inverse, kinds), 1)
+    age = np.maximum(now - events["ts"].astype(np.float64), 0)
+    contributions = WEIGHTS[kinds] * 0.5 ** (age / TRUST_HALF_LIFE)
+    balances = np.bincount(inverse, weights=contributions, minlength=len(uids))
+
+    for i, uid in enumerate(uids.tolist()):
+        data = _new_record()
+        for kind, (field, _, _) in KINDS.items():
+            data[field] = int(counts[i, kind])
+        data["balance"] = float(balances[i])
+        data["balance_ts"] = int(now)
+        data["trust_score"] = _score(balances[i])
+        globals.trust_data[str(uid)] = data
+    del events
+    save_trust()
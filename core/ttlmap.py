@@ -0,0 +1,126 @@
+# core/ttlmap.py
+#
+# Словарь с временем жизни записей. Протухшие записи удаляются лениво (при
+# обращении) и фоновой чисткой: ключи раскладываются по «корзинам» времени
+# истечения, и чистка снимает только корзины, которые уже целиком истекли,
+# не просматривая живые записи. Каждый ключ лежит ровно в одной корзине,
+# поэтому память ограничена числом живых записей (и, при необходимости,
+# maxsize с вытеснением давно не читанных), а не частотой обновлений.
+
+import heapq
+import time
+from typing import Any, Callable, Hashable, Iterator
+
+BUCKETS_PER_TTL = 64
+
+
+class TTLMap:
+    def __init__(
+        self,
+        ttl: float,
+        *,
+        maxsize: int | None = None,
+        granularity: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.granularity = granularity or max(1.0, ttl / BUCKETS_PER_TTL)
+        self.clock = clock
+        # ключ: (истекает, значение); порядок ключей — от давно не читанных к свежим
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        # номер корзины → ключи, истекающие в её интервале (пустые корзины ждут чистки)
+        self._buckets: dict[int, set[Hashable]] = {}
+        self._bucket_heap: list[int] = []
+
+    def _bucket(self, expires: float) -> int:
+        # В корзине b — записи, истекающие в ((b - 1) * g, b * g]
+        return -int(-expires // self.granularity)
+
+    def _remove(self, key: Hashable) -> tuple[float, Any] | None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._buckets[self._bucket(entry[0])].discard(key)
+        return entry
+
+    def put(self, key: Hashable, value: Any, ttl: float | None = None, *, expires: float | None = None):
+        if expires is None:
+            expires = self.clock() + (self.ttl if ttl is None else ttl)
+        self._remove(key)
+        self._data[key] = (expires, value)
+
+        bucket = self._bucket(expires)
+        keys = self._buckets.get(bucket)
+        if keys is None:
+            keys = self._buckets[bucket] = set()
+            heapq.heappush(self._bucket_heap, bucket)
+        keys.add(key)
+
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def lookup(self, key: Hashable, *, touch: bool = False) -> tuple[bool, Any]:
+        """(есть ли живая запись, значение); touch=True — отметить запись как недавно прочитанную."""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= self.clock():
+            self._remove(key)
+            return False, None
+        if touch:
+            del self._data[key]
+            self._data[key] = entry
+        return True, entry[1]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def expires_at(self, key: Hashable) -> float | None:
+        entry = self._data.get(key)
+        return entry[0] if entry is not None and entry[0] > self.clock() else None
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._remove(key)
+        if entry is None or entry[0] <= self.clock():
+            return default
+        return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.lookup(key)[0]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        found, value = self.lookup(key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.put(key, value)
+
+    def __delitem__(self, key: Hashable):
+        if self._remove(key) is None:
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        """Число записей, включая истёкшие, но ещё не вычищенные."""
+        return len(self._data)
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        now = self.clock()
+        return ((key, entry[1]) for key, entry in list(self._data.items()) if entry[0] > now)
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def expire(self, now: float | None = None) -> int:
+        """Удаляет записи из уже целиком истёкших корзин; возвращает, сколько удалено."""
+        now = self.clock() if now is None else now
+        removed = 0
+        while self._bucket_heap and self._bucket_heap[0] * self.granularity <= now:
+            bucket = heapq.heappop(self._bucket_heap)
+            for key in self._buckets.pop(bucket):
+                del self._data[key]
+                removed += 1
+        return removed
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 import time
 import random
 import string
-from core import globals
+from core import globals, leaderboard
 from core.rating import save_ratings
 
 # 🛡️ Проверка на администратора
@@ -34,6 +34,7 @@ async def debug_reset_ratings(update: Update, context: ContextTypes.DEFAULT_TYPE
             "wins": 0,
             "losses": 0
         }
+        leaderboard.update(uid, 3000)
 
     # Боты
     for bot_id in sorted(globals.BOT_PLAYER_IDS):
@@ -42,6 +43,7 @@ async def debug_reset_ratings(update: Update, context: ContextTypes.DEFAULT_TYPE
             "wins": 0,
             "losses": 0
         }
+        leaderboard.update(bot_id, 200)
 
     save_ratings()
     await update.message.reply_text("✅ Рейтинги сброшены: аккаунты = 3000, боты = 200.")
@@ -82,37 +84,22 @@ async def debug_fill_5v5(update: Update, context: ContextTypes.DEFAULT_TYPE):
         globals.queue_5v5.append(player)
         fake_players.append(player)
 
-    # Перемешиваем и делим
-    random.shuffle(fake_players)
-    team_blue = fake_players[:5]
-    team_red = fake_players[5:]
-
-    elo_blue = sum(p["elo"] for p in team_blue)
-    elo_red = sum(p["elo"] for p in team_red)
-
-    captain_blue = max(team_blue, key=lambda p: p["elo"])
-    captain_red = max(team_red, key=lambda p: p["elo"])
-
     match_id = generate_match_id()
     from handlers.matchmaking import prepare_5v5_match, build_match_preview_text
 
-    await prepare_5v5_match(context, match_id, team_blue, team_red)
+    # Составы по ELO делит сам prepare_5v5_match — отдаём ему всех десятерых как есть
+    match_record = await prepare_5v5_match(context, match_id, fake_players[:5], fake_players[5:])
 
-    match_record = globals.active_matches.get(match_id, {})
-    roles = match_record.get("team_roles", {
-        "blue": {"leader": captain_blue["user_id"], "captain": captain_blue["user_id"]},
-        "red": {"leader": None, "captain": captain_red["user_id"]},
-        "lobby_leader": captain_blue["user_id"],
-    })
+    players_by_id = {p["user_id"]: p for p in fake_players}
+    team_blue = [players_by_id[uid] for uid in match_record["teams"]["blue"]]
+    team_red = [players_by_id[uid] for uid in match_record["teams"]["red"]]
 
+    # Автоматически помечаем ботов как готовых, чтобы матч можно было начать
     bot_ids = {int(p["user_id"]) for p in fake_players if p.get("is_bot")}
+    match_record["ready"].update(bot_ids)
 
-    # Автоматически помечаем ботов как готовых, чтобы матч можно было начать
-    if match_record:
-        match_record.setdefault("ready", set()).update(bot_ids)
-    
-    preview = build_match_preview_text(match_id, team_blue, team_red, roles)
+    preview = build_match_preview_text(match_id, team_blue, team_red, match_record["team_roles"])
     await update.message.reply_text(preview)
 
     taken_ids = {p["user_id"] for p in team_blue + team_red}
-    globals.queue_5v5[:] = [p for p in globals.queue_5v5 if p["user_id"] not in taken_ids]
+    globals.queue_5v5.remove_many(taken_ids)
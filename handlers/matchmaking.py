@@ -1,11 +1,25 @@
+import asyncio
+import math
 import time
 import uuid
 import random
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TelegramError
-from core import globals
+from core import globals, storage, trust
 from core.rating import update_ratings, get_rating, add_match_history
 from core.infractions import register_clean_game, register_infraction
+from config import MATCHMAKING_DEBOUNCE, MATCHMAKING_RETRY
+from core.matching import (
+    GROUP_SIZE,
+    estimate_waits_1v1,
+    estimate_waits_5v5,
+    find_groups_5v5,
+    find_pairs_1v1,
+    next_deadline_1v1,
+    next_deadline_5v5,
+)
+from core.balance import balance_teams
+from core.outbox import PRIORITY_LOW, PRIORITY_MATCH, PRIORITY_RESULT, send_all
 from telegram.ext import ContextTypes
 
 
@@ -173,13 +187,12 @@ async def _send_5v5_match_notifications(
     ])
 
     combined = blue_players + red_players
-    blue_ids = {int(p.get("user_id")) for p in blue_players}
 
+    sends = []
     for player in combined:
         pid = int(player.get("user_id"))
         if player.get("is_bot"):
             continue
-        side = "blue" if pid in blue_ids else "red"
         text = build_match_preview_text(
             match_id,
             blue_players,
@@ -187,8 +200,12 @@ async def _send_5v5_match_notifications(
             roles,
             player_id=pid,
         )
+        sends.append(globals.outbox.send_message(
+            bot, pid, text, reply_markup=keyboard, priority=PRIORITY_MATCH,
+        ))
 
-        await bot.send_message(pid, text, reply_markup=keyboard)
+    # Рассылаем всем сразу; первая ошибка отменяет подготовку матча, как и раньше
+    await asyncio.gather(*sends)
 
 
 async def prepare_5v5_match(
@@ -197,6 +214,9 @@ async def prepare_5v5_match(
     blue_players: list[dict],
     red_players: list[dict],
 ):
+    # Составы пересобираются оптимально по ELO/трасту из всех 126 вариантов
+    blue_players, red_players = balance_teams(blue_players + red_players)
+
     player_ids = [int(p.get("user_id")) for p in blue_players + red_players]
     blue_ids = [int(p.get("user_id")) for p in blue_players]
     red_ids = [int(p.get("user_id")) for p in red_players]
@@ -278,14 +298,15 @@ async def handle_lobby_id_submission(update: Update, context: ContextTypes.DEFAU
 
     recipients = match.get("players", []) if match.get("mode") == "5v5" else match.get("teams", {}).get(side, [])
     bot = context.bot
-    for pid in recipients:
-        try:
-            if pid == user_id:
-                await bot.send_message(pid, f"✅ ID лобби {text} сохранён.")
-            else:
-                await bot.send_message(pid, f"🎮 Лидер прислал ID лобби: {text}")
-        except TelegramError:
-            pass
+    await send_all(
+        globals.outbox.send_message(
+            bot,
+            pid,
+            f"✅ ID лобби {text} сохранён." if pid == user_id else f"🎮 Лидер прислал ID лобби: {text}",
+            priority=PRIORITY_RESULT,
+        )
+        for pid in recipients
+    )
 
     if match.get("mode") == "5v5":
         roles = match.get("team_roles", {})
@@ -313,167 +334,268 @@ async def handle_lobby_id_submission(update: Update, context: ContextTypes.DEFAU
                 reply_markup=result_keyboard,
             )
 
-async def send_search_reminder(context: ContextTypes.DEFAULT_TYPE):
-    user_id = context.job.data["user_id"]
-    chat_id = context.job.data["chat_id"]
+# 🔍 Живое сообщение о поиске: одно на игрока, редактируется на месте.
+# Раз в STATUS_TICK секунд проверяем, кому пора обновиться; интервал между
+# правками у каждого игрока растёт с ожиданием (1 → 2 → 4 → 5 мин),
+# неизменившийся текст не отправляется, а при забитой очереди отправки
+# правки откладываются до следующего тика.
+
+STATUS_TICK = 10
+STATUS_MIN_INTERVAL = 60
+STATUS_MAX_INTERVAL = 300
+STATUS_BACKLOG_LIMIT = 200
+
+SEARCH_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("🚪 Выйти из очереди 🚪", callback_data='leave_queue')]]
+)
+
+
+def _format_wait(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    return "меньше минуты" if minutes < 1 else f"{minutes} мин"
+
+
+def search_status_text(mode: str, queue_size: int, elapsed: float, wait: float | None,
+                       estimated: bool = True) -> str:
+    """estimated=False — прогноз ещё не считали (при входе в очередь; его даст ближайший тик)."""
+    title = "🔍 Поиск соперника..." if mode == "1v1" else "🛡 Ожидание команды..."
+    if mode == "5v5" and queue_size < GROUP_SIZE:
+        eta = f"нужно ещё игроков: {GROUP_SIZE - queue_size}"
+    elif not estimated:
+        eta = "оцениваем..."
+    elif wait is None:
+        eta = "ждём игроков близкого рейтинга"
+    elif wait < 60:
+        eta = "меньше минуты"
+    else:
+        eta = f"~{math.ceil(wait / 60)} мин"
+    return (
+        f"{title}\n\n"
+        f"👥 В очереди: {queue_size}\n"
+        f"⏱ В поиске: {_format_wait(elapsed)}\n"
+        f"⌛ Ожидание матча: {eta}"
+    )
+
+
+def estimate_waits(mode: str, queue, now: float) -> dict[int, float | None]:
+    if mode == "1v1":
+        return estimate_waits_1v1(queue, now)
+    return estimate_waits_5v5(queue, now)
+
+
+def ensure_search_status(mode: str):
+    """Запускает обновление статусов поиска режима, если оно ещё не идёт."""
+    key = ("search_status", mode)
+    if key not in globals.timers:
+        globals.timers.schedule(
+            key, time.time() + STATUS_TICK, refresh_search_status,
+            data={"mode": mode}, interval=STATUS_TICK,
+        )
+
+
+async def refresh_search_status(context: ContextTypes.DEFAULT_TYPE, data: dict):
+    mode = data["mode"]
+    queue = globals.queue_1v1 if mode == "1v1" else globals.queue_5v5
+    if not queue:
+        globals.timers.cancel(("search_status", mode))
+        return
+
+    now = time.time()
+    due = [
+        p for p in queue
+        if p.get("notify_message_id") and p.get("status_due", 0) <= now
+    ]
+    if not due or globals.outbox.backlog > STATUS_BACKLOG_LIMIT:
+        return
+
+    waits = estimate_waits(mode, queue, now)
+    edits = []
+    for player in due:
+        interval = player.get("status_interval", STATUS_MIN_INTERVAL)
+        player["status_interval"] = min(interval * 2, STATUS_MAX_INTERVAL)
+        player["status_due"] = now + player["status_interval"]
+
+        text = search_status_text(mode, len(queue), now - player["joined_at"], waits.get(player["user_id"]))
+        if text == player.get("status_text"):
+            continue
+        player["status_text"] = text
+        edits.append(player)
+
+    if edits:
+        # Правки не задерживают колесо таймеров — ждём их в отдельной задаче
+        context.application.create_task(_send_status_edits(context.bot, edits))
+
+
+async def _send_status_edits(bot, players: list[dict]):
+    results = await send_all(
+        globals.outbox.edit_message_text(
+            bot, p["chat_id"], p["notify_message_id"], p["status_text"],
+            reply_markup=SEARCH_KEYBOARD, priority=PRIORITY_LOW,
+        )
+        for p in players
+    )
+    for player, result in zip(players, results, strict=True):
+        if not isinstance(result, Exception) or "not modified" in str(result):
+            continue
+        if "not found" in str(result):
+            # Сообщение удалено — больше его не трогаем
+            player["notify_message_id"] = None
+        else:
+            print(f"❌ Ошибка обновления статуса поиска для {player['user_id']}: {result}")
+
+
+async def _start_match_1v1(context, p1: dict, p2: dict):
+    elo1 = p1['elo']
+    elo2 = p2['elo']
+    p1_id = p1['user_id']
+    p2_id = p2['user_id']
+    match_id = str(uuid.uuid4())
+
+    globals.active_matches[match_id] = {
+        'players': [p1_id, p2_id],
+        'ready': set(),
+        'mode': '1v1',
+        'winner': None,
+        'confirmed': set(),
+        'disputed': False
+    }
+
+    try:
+        usernames = await globals.usernames.fetch_many(context.bot, [p1_id, p2_id])
+        name1 = usernames[int(p1_id)] or f"Игрок {p1_id}"
+        name2 = usernames[int(p2_id)] or f"Игрок {p2_id}"
 
-    # Найдём игрока в очереди
-    for queue in (globals.queue_1v1, globals.queue_5v5):
-        for player in queue:
-            if player["user_id"] == user_id:
-                try:
-                    # Удалим предыдущее напоминание
-                    old_msg_id = player.get("reminder_message_id")
-                    if old_msg_id:
-                        try:
-                            await context.bot.delete_message(chat_id, old_msg_id)
-                        except:
-                            pass  # сообщение уже могло быть удалено вручную
+        kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("✅ Готов", callback_data=f"ready_{match_id}")],
+            [InlineKeyboardButton("❌ Отменить матч", callback_data=f"cancel_{match_id}")]
+        ])
 
-                    # Отправим новое напоминание
-                    msg = await context.bot.send_message(chat_id, "🔍 Всё ещё ищем матч...")
-                    player["reminder_message_id"] = msg.message_id
-                except Exception as e:
-                    print(f"❌ Ошибка напоминания для {user_id}: {e}")
-                return
+        await asyncio.gather(
+            globals.outbox.send_message(
+                context.bot, p1_id, f"👑 Вы лидер лобби!\nСоперник: {name2}",
+                reply_markup=kb, priority=PRIORITY_MATCH,
+            ),
+            globals.outbox.send_message(
+                context.bot, p2_id, f"Лидер лобби: {name1}\nСоперник: {name1}",
+                reply_markup=kb, priority=PRIORITY_MATCH,
+            ),
+        )
 
+        _schedule_autoconfirm(match_id)
 
+    except TelegramError:
+        globals.active_matches.pop(match_id, None)
+        globals.queue_1v1.extend([
+            {"user_id": p1_id, "elo": elo1, "joined_at": p1['joined_at']},
+            {"user_id": p2_id, "elo": elo2, "joined_at": p2['joined_at']}
+        ])
 
 
 async def find_match_1v1(context, chat_id=None, user_id=None):
     now = time.time()
     queue = globals.queue_1v1
 
-    for i, p1 in enumerate(queue):
-        for j, p2 in enumerate(queue):
-            if i >= j:
-                continue
-
-            elo1 = p1['elo']
-            elo2 = p2['elo']
-            elapsed = now - min(p1['joined_at'], p2['joined_at'])
-            tolerance = min(100 + int(elapsed // 30) * 50, 300)
-
-            if abs(elo1 - elo2) <= tolerance:
-                p1_id = p1['user_id']
-                p2_id = p2['user_id']
-                match_id = str(uuid.uuid4())
-
-                globals.active_matches[match_id] = {
-                    'players': [p1_id, p2_id],
-                    'ready': set(),
-                    'mode': '1v1',
-                    'winner': None,
-                    'confirmed': set(),
-                    'disputed': False
-                }
-
-                globals.queue_1v1[:] = [
-                    p for p in queue if p["user_id"] not in [p1_id, p2_id]
-                ]
+    # Все пары за один проход; игроков убираем из очереди до отправки сообщений,
+    # чтобы параллельный проход не взял их повторно
+    pairs = find_pairs_1v1(queue, now)
+    if pairs:
+        taken_ids = {p["user_id"] for pair in pairs for p in pair}
+        globals.queue_1v1.remove_many(taken_ids)
 
-                for pid in [p1_id, p2_id]:
-                    job = globals.search_jobs.pop(pid, None)
-                    if job:
-                        job.schedule_removal()
-
-                try:
-                    u1 = await context.bot.get_chat(p1_id)
-                    u2 = await context.bot.get_chat(p2_id)
-                    name1 = f"@{u1.username}" if u1.username else f"Игрок {p1_id}"
-                    name2 = f"@{u2.username}" if u2.username else f"Игрок {p2_id}"
-
-                    kb = InlineKeyboardMarkup([
-                        [InlineKeyboardButton("✅ Готов", callback_data=f"ready_{match_id}")],
-                        [InlineKeyboardButton("❌ Отменить матч", callback_data=f"cancel_{match_id}")]
-                    ])
-
-                    await context.bot.send_message(p1_id, f"👑 Вы лидер лобби!\nСоперник: {name2}", reply_markup=kb)
-                    await context.bot.send_message(p2_id, f"Лидер лобби: {name1}\nСоперник: {name1}", reply_markup=kb)
-
-                    job = context.job_queue.run_once(
-                        autoconfirm_winner_later, 600, data={"match_id": match_id}
-                    )
-                    globals.match_reminders[match_id] = job
-
-                except TelegramError:
-                    globals.active_matches.pop(match_id, None)
-                    globals.queue_1v1.extend([
-                        {"user_id": p1_id, "elo": elo1, "joined_at": p1['joined_at']},
-                        {"user_id": p2_id, "elo": elo2, "joined_at": p2['joined_at']}
-                    ])
-                return
-
-    for player in globals.queue_1v1:
-        try:
-            chat_id = player.get("chat_id")
-            message_id = player.get("initial_message_id")
-            if chat_id and message_id:
-                await context.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=message_id,
-                    text="🔍 Поиск матча..."
-                )
-        except TelegramError as e:
-            print(f"❌ Ошибка при обновлении напоминания 1v1: {e}")
+        await asyncio.gather(*(_start_match_1v1(context, p1, p2) for p1, p2 in pairs))
+
+
+async def _start_match_5v5(context, group: list[dict]) -> bool:
+    match_id = str(uuid.uuid4())
+    blue_players = group[:5]
+    red_players = group[5:]
+
+    try:
+        await prepare_5v5_match(context, match_id, blue_players, red_players)
+    except TelegramError as exc:
+        print(f"⚠️ Не удалось отправить уведомления о матче {match_id}: {exc}")
+        return False
+    except Exception as exc:
+        print(f"❌ Не удалось подготовить матч {match_id}: {exc}")
+        return False
+
+    _schedule_autoconfirm(match_id)
+    return True
 
 
 async def find_match_5v5(context, chat_id=None, user_id=None):
     now = time.time()
     queue = globals.queue_5v5
 
-    if len(queue) >= 10:
-        for i in range(len(queue) - 9):
-            group = queue[i:i + 10]
-            elos = [p['elo'] for p in group]
-            min_elo = min(elos)
-            max_elo = max(elos)
-            elapsed = now - min(p['joined_at'] for p in group)
-            tolerance = min(100 + int(elapsed // 30) * 50, 300)
-
-            if max_elo - min_elo <= tolerance:
-                match_id = str(uuid.uuid4())
-                blue_players = group[:5]
-                red_players = group[5:]
-                player_ids = [p['user_id'] for p in group]
-                
-                try:
-                    await prepare_5v5_match(context, match_id, blue_players, red_players)
-                except TelegramError as exc:
-                    print(f"⚠️ Не удалось отправить уведомления о матче {match_id}: {exc}")
-                    continue
-                except Exception as exc:
-                    print(f"❌ Не удалось подготовить матч {match_id}: {exc}")
-                    continue
-                                
-                globals.queue_5v5[:] = [
-                    p for p in queue if p["user_id"] not in player_ids
-                ]
+    groups = find_groups_5v5(queue, now)
+    if groups:
+        taken_ids = {p["user_id"] for group in groups for p in group}
+        globals.queue_5v5.remove_many(taken_ids)
+
+        started = await asyncio.gather(*(_start_match_5v5(context, group) for group in groups))
+        for group, ok in zip(groups, started, strict=True):
+            if not ok:
+                # Матч не собрался — возвращаем игроков в очередь
+                globals.queue_5v5.extend(group)
+
+
+# 🧲 Событийный матчмейкинг: проход запускается только после изменения очереди
+# (вход, возврат после отмены) или когда истекает таймер расширения допуска.
+
+def request_matchmaking(mode: str):
+    """Событие очереди: запланировать проход с антидребезгом."""
+    if mode in globals.matchmaking_jobs:
+        return  # проход уже запланирован — он увидит и это изменение
+    globals.matchmaking_jobs[mode] = globals.job_queue.run_once(
+        _matchmaking_pass,
+        MATCHMAKING_DEBOUNCE,
+        data={"mode": mode},
+        name=f"matchmaking_{mode}",
+    )
 
-                for pid in player_ids:
-                    job = globals.search_jobs.pop(pid, None)
-                    if job:
-                        job.schedule_removal()
 
-                job = context.job_queue.run_once(
-                    autoconfirm_winner_later, 600, data={"match_id": match_id}
-                )
-                globals.match_reminders[match_id] = job
-                
-                return
+def reschedule_matchmaking_deadline(mode: str):
+    """Ставит единственный таймер на момент, когда может сложиться новый матч."""
+    job = globals.matchmaking_deadlines.pop(mode, None)
+    if job:
+        job.schedule_removal()
 
-    for player in globals.queue_5v5:
-        try:
-            chat_id = player.get("chat_id")
-            message_id = player.get("initial_message_id")
-            if chat_id and message_id:
-                await context.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=message_id,
-                    text="🔍 Поиск матча 5v5..."
-                )
-        except TelegramError as e:
-            print(f"❌ Ошибка при обновлении напоминания 5v5: {e}")
+    now = time.time()
+    if mode == "1v1":
+        deadline = next_deadline_1v1(globals.queue_1v1, now)
+    else:
+        deadline = next_deadline_5v5(globals.queue_5v5, now)
+    if deadline is None:
+        return
+
+    # Матч уже возможен, но не создан (например, не дошли сообщения) — повторим позже
+    if deadline <= now:
+        deadline = now + MATCHMAKING_RETRY
+
+    globals.matchmaking_deadlines[mode] = globals.job_queue.run_once(
+        _matchmaking_deadline,
+        deadline - now + 0.05,
+        data={"mode": mode},
+        name=f"matchmaking_deadline_{mode}",
+    )
+
+
+async def _matchmaking_pass(context):
+    mode = context.job.data["mode"]
+    globals.matchmaking_jobs.pop(mode, None)
+    try:
+        if mode == "1v1":
+            await find_match_1v1(context)
+        else:
+            await find_match_5v5(context)
+    finally:
+        reschedule_matchmaking_deadline(mode)
+
+
+async def _matchmaking_deadline(context):
+    mode = context.job.data["mode"]
+    globals.matchmaking_deadlines.pop(mode, None)
+    request_matchmaking(mode)
 
 
 async def handle_match_actions(update, context):
@@ -492,9 +614,7 @@ async def handle_match_actions(update, context):
         await query.edit_message_text("✅ Вы подтвердили участие!")
 
         if len(match['ready']) == len(match['players']):
-            job = globals.match_reminders.pop(match_id, None)
-            if job:
-                job.schedule_removal()
+            _cancel_autoconfirm(match_id)
 
             if match['mode'] == '1v1':
                 leader, opponent = match['players']
@@ -509,16 +629,21 @@ async def handle_match_actions(update, context):
                              "Он победил",
                              callback_data=f"report_win_{match_id}_opponent")
                      ]])
-                await context.bot.send_message(leader,
-                                               "Матч начался! Кто победил?",
-                                               reply_markup=kb)
-                await context.bot.send_message(
-                    opponent, "Матч начался! Ждём отчёта о результате.")
+                await asyncio.gather(
+                    globals.outbox.send_message(context.bot, leader,
+                                                "Матч начался! Кто победил?",
+                                                reply_markup=kb,
+                                                priority=PRIORITY_MATCH),
+                    globals.outbox.send_message(
+                        context.bot, opponent, "Матч начался! Ждём отчёта о результате.",
+                        priority=PRIORITY_MATCH),
+                )
             elif match['mode'] == '5v5':
                 roles = match.get("team_roles", {})
                 leader_id = roles.get("lobby_leader") or (roles.get("blue") or {}).get("leader")
                 red_captain = (roles.get("red") or {}).get("captain")
 
+                sends = []
                 if leader_id and not is_bot_player(leader_id):
                     lobby_keyboard = InlineKeyboardMarkup(
                         [
@@ -531,11 +656,15 @@ async def handle_match_actions(update, context):
                                 ]
                             )
 
-                    await context.bot.send_message(
+                    sends.append(globals.outbox.send_message(
+                        context.bot,
                         leader_id,
                         "Матч начался! Пришли ID лобби с помощью кнопки ниже.",
                         reply_markup=lobby_keyboard,
-                    )
+                        priority=PRIORITY_MATCH,
+                    ))
+
+                notes = []
 
                 for pid in match['players']:
                     if pid == leader_id or is_bot_player(pid):
@@ -546,10 +675,12 @@ async def handle_match_actions(update, context):
                     else:
                         note = "Матч начался! Ждём отчёта от лидера лобби."
 
-                    try:
-                        await context.bot.send_message(pid, note)
-                    except TelegramError:
-                        pass
+                    notes.append(globals.outbox.send_message(
+                        context.bot, pid, note, priority=PRIORITY_MATCH,
+                    ))
+
+                # Ошибка отправки лидеру пробрасывается, остальным — игнорируется
+                await asyncio.gather(*sends, send_all(notes))
     
     elif data.startswith("cancel_"):
         match_id = data.split("_", 1)[1]
@@ -559,29 +690,31 @@ async def handle_match_actions(update, context):
 
         _clear_waiting_lobby_ids(match_id)
         
-        job = globals.match_reminders.pop(match_id, None)
-        if job:
-            job.schedule_removal()
-
-        for pid in match['players']:
-            if pid != user_id:
-                try:
-                    await context.bot.send_message(
-                        pid,
-                        "⚠️ Матч отменён другим игроком. Возврат в очередь.")
-                except TelegramError:
-                    pass
-
-                queue = globals.queue_1v1 if match[
-                    "mode"] == "1v1" else globals.queue_5v5
-                queue.append({
-                    "user_id": pid,
-                    "elo": get_rating(pid),
-                    "joined_at": time.time()
-                })
+        _cancel_autoconfirm(match_id)
+
+        others = [pid for pid in match['players'] if pid != user_id]
+        await send_all(
+            globals.outbox.send_message(
+                context.bot, pid,
+                "⚠️ Матч отменён другим игроком. Возврат в очередь.",
+                priority=PRIORITY_MATCH)
+            for pid in others
+        )
+
+        for pid in others:
+            queue = globals.queue_1v1 if match[
+                "mode"] == "1v1" else globals.queue_5v5
+            queue.append({
+                "user_id": pid,
+                "elo": get_rating(pid),
+                "joined_at": time.time()
+            })
+            request_matchmaking(match["mode"])
 
         await query.edit_message_text("❌ Матч отменён.")
-        result = await register_infraction(user_id, "afk", context)
+        with storage.batch():
+            result = register_infraction(user_id, "afk")
+            trust.commit(context)
         if result == "warn":
             await context.bot.send_message(
                 user_id, "⚠️ Предупреждение за отказ от матча.")
@@ -667,9 +800,7 @@ async def handle_result_confirmation(update, context):
             except TelegramError:
                 pass
 
-            job = globals.match_reminders.pop(match_id, None)
-            if job:
-                job.schedule_removal()
+            _cancel_autoconfirm(match_id)
 
             if confirm_target and not is_bot_player(confirm_target):
                 kb = InlineKeyboardMarkup([
@@ -685,12 +816,7 @@ async def handle_result_confirmation(update, context):
                     reply_markup=kb,
                 )
 
-                job2 = context.job_queue.run_once(
-                    autoconfirm_winner_later,
-                    600,
-                    data={"match_id": match_id},
-                )
-                globals.match_reminders[match_id] = job2
+                _schedule_autoconfirm(match_id)
             else:
                 match['confirmed'] = set(match['players'])
                 await _finalize_match_result(match_id, context, reason="bot_auto")
@@ -719,14 +845,8 @@ async def handle_result_confirmation(update, context):
                                        "💬 Подтвердите, что вы проиграли:",
                                        reply_markup=kb)
 
-        job = globals.match_reminders.pop(match_id, None)
-        if job:
-            job.schedule_removal()
-
-        job2 = context.job_queue.run_once(autoconfirm_winner_later,
-                                          600,
-                                          data={"match_id": match_id})
-        globals.match_reminders[match_id] = job2
+        # Повторная постановка заменяет прежний таймер матча
+        _schedule_autoconfirm(match_id)
 
     elif data.startswith("confirm_win_"):
         match_id = data.split("_", 2)[2]
@@ -747,9 +867,7 @@ async def handle_result_confirmation(update, context):
 
         globals.pending_results.pop(match_id, None)
         
-        job = globals.match_reminders.pop(match_id, None)
-        if job:
-            job.schedule_removal()
+        _cancel_autoconfirm(match_id)
 
         match['disputed'] = True
         winner_info = match.get('winner')
@@ -761,10 +879,26 @@ async def handle_result_confirmation(update, context):
                                        "✅ Жалоба принята. Матч аннулирован.")
 
 
-# 🧠 Используется в подтверждении результатов
-async def autoconfirm_winner_later(context):
-    job = context.job
-    match_id = job.data["match_id"]
+# ⏰ Через сколько секунд результат засчитывается автоматически
+AUTOCONFIRM_DELAY = 600
+
+
+def _schedule_autoconfirm(match_id: str):
+    globals.timers.schedule(
+        ("autoconfirm", match_id),
+        time.time() + AUTOCONFIRM_DELAY,
+        autoconfirm_winner_later,
+        data={"match_id": match_id},
+    )
+
+
+def _cancel_autoconfirm(match_id: str):
+    globals.timers.cancel(("autoconfirm", match_id))
+
+
+# 🧠 Используется в подтверждении результатов (срабатывает из колеса таймеров)
+async def autoconfirm_winner_later(context, data: dict):
+    match_id = data["match_id"]
 
     match = globals.active_matches.get(match_id)
     if not match or match.get("disputed") or not match.get("winner"):
@@ -782,9 +916,7 @@ async def _finalize_match_result(match_id: str, context, *, reason: str | None =
 
     _clear_waiting_lobby_ids(match_id)
 
-    job = globals.match_reminders.pop(match_id, None)
-    if job:
-        job.schedule_removal()
+    _cancel_autoconfirm(match_id)
 
     winner_info = match["winner"]
     winners: list[int]
@@ -805,59 +937,61 @@ async def _finalize_match_result(match_id: str, context, *, reason: str | None =
     if not winners or not losers:
         return
 
-    rating_changes = update_ratings(winners, losers)
-    match_data = {
-        "players": match['players'],
-        "winner": winners if match.get("mode") == "5v5" else winners[0],
-        "mode": match['mode'],
-        "timestamp": int(time.time()),
-    }
-    if winner_side:
-        match_data["winner_side"] = winner_side
-    add_match_history(match_id, match_data)
-
     human_winners = [uid for uid in winners if not is_bot_player(uid)]
     human_losers = [uid for uid in losers if not is_bot_player(uid)]
 
+    # Рейтинги, история, нарушения и траст меняются в памяти одним блоком
+    # и уходят на диск одной задачей записи; уведомления — уже после
+    with storage.batch():
+        rating_changes = update_ratings(winners, losers)
+        match_data = {
+            "players": match['players'],
+            "winner": winners if match.get("mode") == "5v5" else winners[0],
+            "mode": match['mode'],
+            "timestamp": int(time.time()),
+        }
+        if winner_side:
+            match_data["winner_side"] = winner_side
+        add_match_history(match_id, match_data)
+
+        for uid in human_winners:
+            register_clean_game(uid)
+        for uid in human_losers:
+            # По таймауту неподтвердивший проигравший получает AFK
+            if reason == "timeout":
+                register_infraction(uid, "afk")
+            else:
+                register_clean_game(uid)
+        trust.commit(context)
+
     def _format_rating_change(pid: int) -> str:
         delta = rating_changes.get(int(pid), 0)
         sign = "+" if delta > 0 else ""
         return f"{sign}{delta} ELO (текущий рейтинг: {get_rating(pid)})"
         
     if reason == "timeout":
-        for uid in human_winners:
-            await _register_clean_if_human(uid, context)
-            await context.bot.send_message(
-                uid,
-                "⏱ Победа засчитана автоматически.\n"
-                f"Изменение рейтинга: {_format_rating_change(uid)}",
-            )
-        for uid in human_losers:
-            await _register_infraction_if_human(uid, "afk", context)
-            await context.bot.send_message(
-                uid,
-                "⚠️ Вы не подтвердили матч — засчитано поражение.\n"
-                f"Изменение рейтинга: {_format_rating_change(uid)}",
-            )
+        await _send_result_notices(context, [
+            *(
+                (uid, "⏱ Победа засчитана автоматически.\n"
+                      f"Изменение рейтинга: {_format_rating_change(uid)}")
+                for uid in human_winners
+            ),
+            *(
+                (uid, "⚠️ Вы не подтвердили матч — засчитано поражение.\n"
+                      f"Изменение рейтинга: {_format_rating_change(uid)}")
+                for uid in human_losers
+            ),
+        ])
         return
 
-    for uid in human_winners:
-        await _register_clean_if_human(uid, context)
-
     if reason == "bot_auto":
-        for uid in human_losers:
-            await _register_clean_if_human(uid, context)
-        for uid in human_winners:
-            await context.bot.send_message(
-                uid,
-                "🤖 Победа подтверждена автоматически — соперник был ботом.\n"
-                f"Изменение рейтинга: {_format_rating_change(uid)}",
-            )
+        await _send_result_notices(context, [
+            (uid, "🤖 Победа подтверждена автоматически — соперник был ботом.\n"
+                  f"Изменение рейтинга: {_format_rating_change(uid)}")
+            for uid in human_winners
+        ])
         return
 
-    for uid in human_losers:
-        await _register_clean_if_human(uid, context)
-
     if winner_side:
         win_message = f"🏆 Победа команды {winner_side.upper()} подтверждена."
         lose_side = "red" if winner_side == "blue" else "blue"
@@ -866,23 +1000,24 @@ async def _finalize_match_result(match_id: str, context, *, reason: str | None =
         win_message = "🏆 Победа подтверждена."
         lose_message = "👍 Вы подтвердили поражение."
 
-    for uid in human_winners:
-        await context.bot.send_message(
-            uid,
-            f"{win_message}\nИзменение рейтинга: {_format_rating_change(uid)}",
-        )
-    for uid in human_losers:
-        await context.bot.send_message(
-            uid,
-            f"{lose_message}\nИзменение рейтинга: {_format_rating_change(uid)}",
-        )
-
-
-async def _register_clean_if_human(user_id: int, context):
-    if not is_bot_player(int(user_id)):
-        await register_clean_game(user_id, context)
+    await _send_result_notices(context, [
+        *(
+            (uid, f"{win_message}\nИзменение рейтинга: {_format_rating_change(uid)}")
+            for uid in human_winners
+        ),
+        *(
+            (uid, f"{lose_message}\nИзменение рейтинга: {_format_rating_change(uid)}")
+            for uid in human_losers
+        ),
+    ])
 
 
-async def _register_infraction_if_human(user_id: int, infraction: str, context):
-    if not is_bot_player(int(user_id)):
-        await register_infraction(user_id, infraction, context)
+async def _send_result_notices(context, notices: list[tuple[int, str]]):
+    """Рассылает итоги матча всем игрокам одновременно через общую очередь отправки."""
+    results = await send_all(
+        globals.outbox.send_message(context.bot, uid, text, priority=PRIORITY_RESULT)
+        for uid, text in notices
+    )
+    for (uid, _), result in zip(notices, results, strict=True):
+        if isinstance(result, Exception):
+            print(f"⚠️ Не удалось отправить итог матча {uid}: {result}")
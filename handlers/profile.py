@@ -1,16 +1,19 @@
 # handlers/profile.py
 
+import calendar
 import time
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import InlineQueryResultArticle, InputTextMessageContent
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from core.rating import get_profile
-from core import globals
-from core.trust import recalculate_trust_score
+from core import globals, leaderboard, rating_series
+from core.trust import get_trust_score
 from core.rating import get_rating
 from core.infractions import register_clean_game
 import asyncio
-from core.names import load_names, save_names, load_nick_timestamps, save_nick_timestamps
+from core.names import load_names, load_nick_timestamps, save_nick_timestamps
+from core.names import complete_name, find_user_by_name, set_display_name
 from core.names import cache_username
 from core.names import get_display_name, cache_username
 from core.names import get_display_name_with_link
@@ -57,19 +60,13 @@ async def top(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     cache_username(user)
 
-    top_players = sorted(
-        globals.ratings.items(),
-        key=lambda x: x[1].get("rating", 1000),
-        reverse=True
-    )[:10]
-
+    # Состав топа кэшируется в лидерборде, а имена берутся свежие при каждом показе
     message = "🏆 Топ 10 игроков:\n\n"
 
-    for index, (uid_str, data) in enumerate(top_players, start=1):
+    for index, (uid_str, rating) in enumerate(leaderboard.top_entries(), start=1):
         uid = int(uid_str)
         name = get_display_name(uid)
         name = html.escape(name)  # экранируем спецсимволы для HTML
-        rating = data.get("rating", 1000)
 
         name_with_link = f"<a href='tg://user?id={uid}'>{name}</a>"
         message += f"{index}. {name_with_link} ({rating} ELO)\n"
@@ -82,6 +79,64 @@ async def top(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(message, parse_mode=ParseMode.HTML)
 
 
+async def rank(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    place = leaderboard.rank(user_id)
+    if place is None:
+        await update.message.reply_text("ℹ️ У вас ещё нет рейтинга — сыграйте первый матч через /find.")
+        return
+
+    position, total = place
+    percentile = leaderboard.percentile(user_id)
+    text = (
+        f"📊 Ваше место: {position} из {total}\n"
+        f"🏆 ELO: {get_rating(user_id)}\n"
+        f"📈 Вы выше, чем {percentile:.1f}% игроков"
+    )
+    await update.message.reply_text(text)
+
+
+PROGRESS_DEFAULT_POINTS = 10
+PROGRESS_MAX_POINTS = 50
+
+
+def _parse_day(value: str) -> int:
+    return calendar.timegm(time.strptime(value, "%Y-%m-%d"))
+
+
+async def progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/progress [N] — последние N изменений рейтинга; /progress ГГГГ-ММ-ДД ГГГГ-ММ-ДД — за период."""
+    user_id = update.effective_user.id
+    args = context.args or []
+
+    try:
+        if len(args) == 2:
+            start_ts, end_ts = _parse_day(args[0]), _parse_day(args[1]) + 86400 - 1
+            points = rating_series.between(user_id, start_ts, end_ts)[-PROGRESS_MAX_POINTS:]
+        elif len(args) <= 1:
+            n = int(args[0]) if args else PROGRESS_DEFAULT_POINTS
+            points = rating_series.last(user_id, min(max(n, 1), PROGRESS_MAX_POINTS))
+        else:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(
+            "Использование: /progress [N] или /progress ГГГГ-ММ-ДД ГГГГ-ММ-ДД"
+        )
+        return
+
+    if not points:
+        await update.message.reply_text("ℹ️ Изменений рейтинга за этот период нет.")
+        return
+
+    first_rating = points[0][1] - points[0][2]
+    total = points[-1][1] - first_rating
+    lines = [f"📈 Рейтинг: {first_rating} → {points[-1][1]} ({total:+d})\n"]
+    for ts, rating, delta in points:
+        date = time.strftime("%Y-%m-%d %H:%M", time.gmtime(ts))
+        lines.append(f"{'🟢' if delta >= 0 else '🔴'} {date} — {rating} ({delta:+d})")
+    await update.message.reply_text("\n".join(lines))
+
+
 
 
 async def trust(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -91,7 +146,7 @@ async def trust(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("ℹ️ У вас ещё нет данных по траст-фактору.")
         return
 
-    score = data.get("trust_score", 100)
+    score = get_trust_score(user_id)
     reports = data.get("reports", 0)
     clean = data.get("confirmed_matches", 0)
     afk = data.get("afk", 0)
@@ -110,11 +165,7 @@ async def trust(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def get_display_name_async(user_id, context):
     nickname = globals.names.get(str(user_id))
-    try:
-        user = await context.bot.get_chat(user_id)
-        username = f"@{user.username}" if user.username else None
-    except:
-        username = None
+    username = await globals.usernames.fetch(context.bot, user_id)
     if nickname and username:
         return f"{nickname} ({username})"
     elif nickname:
@@ -125,39 +176,88 @@ async def get_display_name_async(user_id, context):
         return f"ID {user_id}"
 
 
-async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-    user_matches = []
-    for match in globals.matches.values():
-        player_ids = [str(pid) for pid in match.get("players", [])]
-        if user_id in player_ids:
-            user_matches.append(match)
-
-    if not user_matches:
-        await update.message.reply_text("ℹ️ У вас пока нет сыгранных матчей.")
-        return
-
-    user_matches = sorted(user_matches, key=lambda x: x["timestamp"], reverse=True)[:10]
-    lines = ["📜 Последние 10 матчей:\n"]
-
-    for m in user_matches:
-        mode = m.get("mode", "1v1")
-        date = time.strftime("%Y-%m-%d %H:%M", time.gmtime(m["timestamp"]))
-        win = str(m.get("winner")) == user_id
-        result = "✅ Победа" if win else "❌ Поражение"
-
-        if mode == "1v1":
-            opponent = [pid for pid in m["players"] if str(pid) != user_id][0]
-            name = await get_display_name_async(opponent, context)
-            lines.append(f"{result} против {name} — {date}")
-        else:
-            lines.append(f"{result} в 5v5 — {date}")
-
-    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
-
-
-
-
+HISTORY_PAGE_SIZE = 10
+
+
+def _history_page(user_id: int, cursor: str | None = None, direction: str = "o"):
+    """Страница истории игрока: (номер первого матча, match_id на странице, всего, есть ли новее, есть ли старше).
+
+    cursor — match_id с края текущей страницы; "o" — листаем к более старым, "n" — к более новым.
+    """
+    ordered = list(reversed(globals.match_index.get(user_id, ())))  # от новых к старым
+    start = 0
+    if cursor in ordered:
+        position = ordered.index(cursor)
+        start = position + 1 if direction == "o" else max(0, position - HISTORY_PAGE_SIZE)
+    page = ordered[start:start + HISTORY_PAGE_SIZE]
+    return start, page, len(ordered), start > 0, start + HISTORY_PAGE_SIZE < len(ordered)
+
+
+async def _history_text(user_id: int, context, cursor: str | None = None, direction: str = "o"):
+    """Текст и клавиатура страницы истории; (None, None) — матчей нет."""
+    start, page, total, has_newer, has_older = _history_page(user_id, cursor, direction)
+    if not page:
+        return None, None
+
+    user_matches = [globals.matches[mid] for mid in page if mid in globals.matches]
+    lines = [f"📜 Матчи {start + 1}–{start + len(page)} из {total}:\n"]
+
+    # Профили всех соперников подтягиваем разом, а не по одному на строку
+    opponents = [
+        pid for m in user_matches if m.get("mode", "1v1") == "1v1"
+        for pid in m["players"] if int(pid) != user_id
+    ]
+    await globals.usernames.fetch_many(context.bot, opponents)
+
+    for m in user_matches:
+        mode = m.get("mode", "1v1")
+        date = time.strftime("%Y-%m-%d %H:%M", time.gmtime(m["timestamp"]))
+        winner = m.get("winner")
+        win = user_id in [int(pid) for pid in winner] if isinstance(winner, list) else str(winner) == str(user_id)
+        result = "✅ Победа" if win else "❌ Поражение"
+
+        if mode == "1v1":
+            opponent = [pid for pid in m["players"] if int(pid) != user_id][0]
+            name = await get_display_name_async(opponent, context)
+            lines.append(f"{result} против {name} — {date}")
+        else:
+            lines.append(f"{result} в 5v5 — {date}")
+
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton("⬅️ Новее", callback_data=f"hist_n_{page[0]}"))
+    if has_older:
+        buttons.append(InlineKeyboardButton("Старше ➡️", callback_data=f"hist_o_{page[-1]}"))
+    keyboard = InlineKeyboardMarkup([buttons]) if buttons else None
+    return "\n".join(lines), keyboard
+
+
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    text, keyboard = await _history_text(user_id, context)
+    if text is None:
+        await update.message.reply_text("ℹ️ У вас пока нет сыгранных матчей.")
+        return
+
+    await update.message.reply_text(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+# Кнопки «Новее» / «Старше» в /history
+async def history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    _, direction, cursor = query.data.split("_", 2)
+
+    text, keyboard = await _history_text(query.from_user.id, context, cursor, direction)
+    if text is None:
+        await query.edit_message_text("ℹ️ У вас пока нет сыгранных матчей.")
+        return
+
+    await query.edit_message_text(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+
+
 async def set_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
     args = context.args
@@ -178,13 +278,39 @@ async def set_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Ник не может быть пустым.")
         return
 
-    if new_name in globals.names.values() and globals.names.get(user_id) != new_name:
+    owner = find_user_by_name(new_name)
+    if owner is not None and owner != user_id:
         await update.message.reply_text("Этот ник уже используется другим игроком.")
         return
 
-    globals.names[user_id] = new_name
+    set_display_name(user_id, new_name)
     globals.name_change_timestamps[user_id] = now
-    save_names()
     save_nick_timestamps()
 
     await update.message.reply_text(f"✅ Ваш ник установлен: {new_name}")
+
+
+# 🔎 Автодополнение ников в inline-режиме: @бот <начало ника>
+async def inline_name_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.inline_query
+    prefix = query.query.strip()
+    if not prefix:
+        await query.answer([], cache_time=30)
+        return
+
+    results = []
+    for uid in complete_name(prefix, limit=10):
+        name = globals.names.get(uid)
+        if not name:
+            continue
+        rating = get_rating(uid)
+        results.append(
+            InlineQueryResultArticle(
+                id=uid,
+                title=name,
+                description=f"ID {uid} · {rating} ELO",
+                input_message_content=InputTextMessageContent(f"👤 {name}\nID: {uid}\n🏆 ELO: {rating}"),
+            )
+        )
+
+    await query.answer(results, cache_time=30)
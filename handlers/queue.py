@@ -2,9 +2,16 @@ import time
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
 from core import globals
-from core.bans import is_banned
+from core.bans import get_ban
 from core.rating import get_rating
-from handlers.matchmaking import find_match_1v1, find_match_5v5
+from handlers.matchmaking import (
+    SEARCH_KEYBOARD,
+    STATUS_MIN_INTERVAL,
+    ensure_search_status,
+    request_matchmaking,
+    reschedule_matchmaking_deadline,
+    search_status_text,
+)
 
 COOLDOWN_SECONDS = 5
 
@@ -13,11 +20,11 @@ async def find(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     now = time.time()
 
-    if user_id in globals.user_cooldowns and now - globals.user_cooldowns[user_id] < COOLDOWN_SECONDS:
+    if user_id in globals.user_cooldowns:
         await update.message.reply_text("⏳ Подождите несколько секунд перед повторной попыткой.")
         return
 
-    globals.user_cooldowns[user_id] = now
+    globals.user_cooldowns.put(user_id, now, ttl=COOLDOWN_SECONDS)
 
     keyboard = [
         [InlineKeyboardButton("🔁 1 на 1", callback_data='mode_1v1')],
@@ -35,77 +42,59 @@ async def handle_mode_choice(update: Update, context: ContextTypes.DEFAULT_TYPE)
     mode = query.data
     now = time.time()
 
-    # Проверка бана
-    bans = globals.bans.get(str(user_id))
-    if bans:
-        until = bans.get("until")
-        reason = bans.get("reason", "не указана")
+    # Проверка бана (истёкшие баны снимает фоновая чистка в core/bans.py)
+    ban_info = get_ban(user_id, now)
+    if ban_info:
+        until = ban_info.get("until", -1)
+        reason = ban_info.get("reason", "не указана")
         if until == -1:
             await query.edit_message_text(f"🚫 Вы забанены навсегда.\nПричина: {reason}")
-            return
-        elif until and until > now:
+        else:
             unban_time = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(until))
             await query.edit_message_text(f"🚫 Вы временно забанены до {unban_time}.\nПричина: {reason}")
-            return
-        else:
-            del globals.bans[str(user_id)]
+        return
 
     is_1v1 = mode == "mode_1v1"
     queue = globals.queue_1v1 if is_1v1 else globals.queue_5v5
     other_queue = globals.queue_5v5 if is_1v1 else globals.queue_1v1
 
     # Удалим из другой очереди
-    other_queue[:] = [p for p in other_queue if p["user_id"] != user_id]
+    other_queue.remove(user_id)
 
     # Проверим, не находится ли игрок уже в очереди
-    if any(p["user_id"] == user_id for p in queue):
+    if user_id in queue:
         await query.edit_message_text("⏳ Вы уже в очереди.")
         return
 
-    # Кнопка "выйти из очереди"
-    keyboard = [[InlineKeyboardButton("🚪 Выйти из очереди 🚪", callback_data='leave_queue')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    # Отправим сообщение поиска
-    search_msg = await query.edit_message_text(
-        "🔍 Поиск соперника..." if is_1v1 else "🛡 Ожидание команды...",
-        reply_markup=reply_markup
-    )
-
-    # Добавим игрока в очередь
+    mode_name = "1v1" if is_1v1 else "5v5"
     entry = {
         "user_id": user_id,
         "elo": get_rating(user_id),
         "joined_at": now,
         "chat_id": query.message.chat_id,
-        "notify_message_id": search_msg.message_id,
+        "notify_message_id": None,
     }
 
-    if not is_1v1:
-        entry.update({
-            "reminder_message_id": None,
-            "last_notified": 0,
-        })
+    # Сообщение поиска — дальше оно же обновляется на месте (очередь, время, прогноз).
+    # Прогноз требует сортировки всей очереди, поэтому при входе его не считаем:
+    # ближайший тик refresh_search_status (раз в STATUS_TICK) покажет его
+    text = search_status_text(mode_name, len(queue) + 1, 0, None, estimated=False)
+    search_msg = await query.edit_message_text(text, reply_markup=SEARCH_KEYBOARD)
 
+    # Добавим игрока в очередь
+    entry.update({
+        "notify_message_id": search_msg.message_id,
+        "status_text": text,
+        "status_due": now,
+        # после первого обновления следующее — через STATUS_MIN_INTERVAL
+        "status_interval": STATUS_MIN_INTERVAL // 2,
+    })
     queue.append(entry)
+    ensure_search_status(mode_name)
 
-    # Запуск периодических напоминаний (каждые 60 сек)
-    job = context.job_queue.run_repeating(
-        globals.send_search_reminder,
-        interval=60,
-        first=60,
-        data={
-            "user_id": user_id,
-            "chat_id": query.message.chat_id,
-        }
-    )
-    globals.search_jobs[user_id] = job
-
-    
-    if is_1v1:
-        await find_match_1v1(context, query.message.chat_id, user_id)
-    else:
-        await find_match_5v5(context, query.message.chat_id, user_id)
+    # Удаление из другой очереди могло сдвинуть её таймер допуска
+    reschedule_matchmaking_deadline("5v5" if is_1v1 else "1v1")
+    request_matchmaking(mode_name)
 
 
 # Выход из очереди
@@ -115,37 +104,21 @@ async def handle_leave_queue(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = query.from_user.id
 
     for queue, mode_name in [(globals.queue_1v1, "1v1"), (globals.queue_5v5, "5v5")]:
-        for player in queue:
-            if player["user_id"] == user_id:
-                queue.remove(player)
-
-                # 🧹 Удаляем напоминание (если было)
-                reminder_msg_id = player.get("reminder_message_id")
-                if reminder_msg_id:
-                    try:
-                        await context.bot.delete_message(
-                            chat_id=player["chat_id"],
-                            message_id=reminder_msg_id
-                        )
-                    except Exception as e:
-                        print(f"⚠️ Не удалось удалить напоминание: {e}")
-
-                # 🧠 Отменяем задачу из job_queue (если есть)
-                job = globals.search_jobs.pop(user_id, None)
-                if job:
-                    job.schedule_removal()
-
-                # ✏️ Редактируем сообщение с кнопкой выхода
-                try:
-                    await context.bot.edit_message_text(
-                        chat_id=player["chat_id"],
-                        message_id=player["notify_message_id"],
-                        text=f"🚪 Вы вышли из очереди 🚪 {mode_name}.",
-                    )
-                except Exception as e:
-                    if "Message is not modified" not in str(e):
-                        print(f"Ошибка при редактировании сообщения выхода: {e}")
-                return
+        player = queue.remove(user_id)
+        if player:
+            reschedule_matchmaking_deadline(mode_name)
+
+            # ✏️ Редактируем сообщение с кнопкой выхода
+            try:
+                await context.bot.edit_message_text(
+                    chat_id=player["chat_id"],
+                    message_id=player["notify_message_id"],
+                    text=f"🚪 Вы вышли из очереди 🚪 {mode_name}.",
+                )
+            except Exception as e:
+                if "Message is not modified" not in str(e):
+                    print(f"Ошибка при редактировании сообщения выхода: {e}")
+            return
 
     # ⚠️ Если игрок не найден в очереди
     try:
@@ -1,35 +1,44 @@
 # handlers/report.py
 
 import time
-import json
 from telegram import Update
 from telegram.ext import ContextTypes
-from core.trust import recalculate_trust_score, save_trust
-from core import globals
+from config import REPORT_LOG_FILE
+from core import globals, storage, trust
+from core.ttlmap import TTLMap
+from core.names import find_user_by_name
+
+
+REPORT_COOLDOWN = 24 * 60 * 60  # повторная жалоба на того же игрока — не раньше чем через сутки
 
 
 def load_report_log():
-    try:
-        with open("report_log.json", 'r') as f:
-            globals.report_log = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        globals.report_log = {}
-        save_report_log()
+    # В файле только жалобы за последние сутки; старые отбрасываются при загрузке
+    globals.report_log = TTLMap(REPORT_COOLDOWN)
+    for key, reported_at in storage.load_table("report_log").items():
+        globals.report_log.put(key, reported_at, expires=reported_at + REPORT_COOLDOWN)
+    globals.report_log.expire()
 
 
 def save_report_log():
-    with open("report_log.json", 'w') as f:
-        json.dump(globals.report_log, f)
+    storage.mark_dirty("report_log")
+
+
+def expire_report_log():
+    """Фоновая чистка: убирает жалобы старше суток (и из файла тоже)."""
+    if globals.report_log.expire():
+        save_report_log()
+
+
+storage.register("report_log", REPORT_LOG_FILE, lambda: globals.report_log.to_dict())
 
 
 def resolve_user_id(identifier: str):
     """Определяет user_id по ID или нику"""
     if identifier.isdigit():
         return int(identifier)
-    for uid_str, nick in globals.names.items():
-        if nick.lower() == identifier.lower():
-            return int(uid_str)
-    return None
+    uid_str = find_user_by_name(identifier)
+    return int(uid_str) if uid_str is not None else None
 
 
 async def report_player(reporter_id, target_id, reason="", context=None):
@@ -38,27 +47,14 @@ async def report_player(reporter_id, target_id, reason="", context=None):
     tuid = str(target_id)
 
     key = f"{ruid}:{tuid}"
-    last_time = globals.report_log.get(key, 0)
-    if now - last_time < 86400:
+    if key in globals.report_log:
         return "already_reported"
 
     globals.report_log[key] = now
     save_report_log()
 
-    if tuid not in globals.trust_data:
-        globals.trust_data[tuid] = {
-            "reports": 0,
-            "confirmed_matches": 0,
-            "afk": 0,
-            "trust_score": 100
-        }
-
-    globals.trust_data[tuid]["reports"] += 1
-    save_trust()
-    if context:
-        await recalculate_trust_score(target_id, context, reason="получен репорт")
-    else:
-        await recalculate_trust_score(target_id)
+    trust.record_event(target_id, trust.REPORT, now)
+    trust.commit(context)
 
     return "success"
 
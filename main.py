@@ -1,6 +1,5 @@
 import sys
 import os
-import time
 import logging
 from dotenv import load_dotenv
 
@@ -11,25 +10,27 @@ from telegram.ext import (
     CommandHandler,
     CallbackQueryHandler,
     ContextTypes,
+    InlineQueryHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
+from telegram import Update
 
-from core import globals
+from core import bans, globals, storage, timers
 from core.trust import load_trust
-from core.infractions import load_infractions, save_infractions
+from core.infractions import load_infractions
 from core.rating import load_ratings, load_matches
-from core.bans import load_bans
-from core.names import load_names, load_nick_timestamps
+from core.rating_series import load_series
+from core.names import load_names, load_nick_timestamps, cache_username
 
-from handlers.profile import start, profile, top, trust, history, set_name
-from handlers.report import report_command, load_report_log
+from handlers.profile import start, profile, top, rank, progress, trust, history, history_page, set_name
+from handlers.profile import inline_name_search
+from handlers.report import report_command, load_report_log, expire_report_log
 from handlers.queue import find, handle_mode_choice, handle_leave_queue
 from handlers.matchmaking import (
     handle_match_actions,
     handle_result_confirmation,
-    find_match_1v1,
-    find_match_5v5,
     handle_lobby_id_submission,
 )
 from handlers.admin import (
@@ -58,8 +59,6 @@ if not my_bot_token:
     logger.critical("❌ Переменная BOT_TOKEN не найдена в .env")
     sys.exit(1)
 
-last_reset = 0  # Сброс варнов
-
 
 async def debug_mention(update, context):
     uid = update.effective_user.id
@@ -67,39 +66,43 @@ async def debug_mention(update, context):
     await update.message.reply_text(html, parse_mode="HTML")
 
 
+# 👤 Запоминаем username из каждого апдейта — get_chat потом почти не нужен
+async def remember_user(update: Update, _context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user:
+        cache_username(update.effective_user)
+
+
 # ✅ Унифицированная загрузка всех данных
 def load_all_data():
     load_trust()
     load_infractions()
     load_ratings()
     load_matches()
-    load_bans()
+    load_series()
+    bans.load_bans()
     load_names()
     load_nick_timestamps()
     load_report_log()
     logger.info("✅ Все данные успешно загружены")
 
 
-# 📅 Фоновая задача матчмейкинга + сброса варнов
-async def matchmaking_job(context: ContextTypes.DEFAULT_TYPE):
-    global last_reset
-    now = int(time.time())
+# 📤 Запускаем воркеры очереди исходящих сообщений (нужен работающий event loop)
+async def start_outbox(_app: Application):
+    await globals.outbox.start()
+
 
-    try:
-        # Эти функции — async, поэтому await тут корректен внутри job queue
-        await find_match_1v1(context)
-        await find_match_5v5(context)
+# 💾 Сохраняем всё несохранённое при остановке бота
+async def flush_on_shutdown(_app: Application):
+    await globals.outbox.stop()
+    storage.shutdown()
+    logger.info("💾 Данные сохранены перед остановкой")
 
-        if now - last_reset >= 86400:
-            for uid in globals.infractions:
-                globals.infractions[uid]["warnings"] = 0
-                globals.infractions[uid]["last_reset"] = now
-            save_infractions()
-            last_reset = now
-            logger.info("🔁 Предупреждения обнулены")
 
-    except Exception:
-        logger.exception("❌ Ошибка в matchmaking_job")
+# 🧹 Фоновая чистка истёкших записей TTL-словарей (чтение их и так не видит)
+async def evict_expired_job(_context: ContextTypes.DEFAULT_TYPE):
+    expire_report_log()
+    globals.user_cooldowns.expire()
+    globals.usernames.expire()
 
 
 def main():
@@ -111,6 +114,8 @@ def main():
         .token(my_bot_token) \
         .request(request) \
         .concurrent_updates(True) \
+        .post_init(start_outbox) \
+        .post_shutdown(flush_on_shutdown) \
         .build()
 
     
@@ -118,15 +123,21 @@ def main():
     globals.app = app
     globals.job_queue = app.job_queue
 
-    from handlers.matchmaking import send_search_reminder
-    globals.send_search_reminder = send_search_reminder
-
     load_all_data()
+    storage.start(app.job_queue)
+    timers.start(globals.timers, app.job_queue)
+    bans.start(app.job_queue)
+    app.job_queue.run_repeating(evict_expired_job, interval=60, first=60)
+
+    # Перед всеми обработчиками
+    app.add_handler(TypeHandler(Update, remember_user), group=-1)
 
     # Обычные команды
     app.add_handler(CommandHandler("start", start, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("profile", profile, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("top", top, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("rank", rank, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("progress", progress, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("trust", trust, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("history", history, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("setname", set_name, filters=filters.ChatType.PRIVATE))
@@ -155,6 +166,10 @@ def main():
     # Кнопки
     app.add_handler(CallbackQueryHandler(handle_mode_choice, pattern="^mode_"))
     app.add_handler(CallbackQueryHandler(handle_leave_queue, pattern="^leave_"))
+    app.add_handler(CallbackQueryHandler(history_page, pattern="^hist_(n|o)_"))
+
+    # Поиск игроков по нику через inline-режим
+    app.add_handler(InlineQueryHandler(inline_name_search))
     app.add_handler(CallbackQueryHandler(handle_match_actions, pattern="^(ready|cancel)_"))
     app.add_handler(CallbackQueryHandler(handle_result_confirmation, pattern="^(report_win|confirm_win|reject_win)_"))
 
@@ -195,12 +210,9 @@ def main():
         group=1
     )
 
-    # Фоновая задача
-    app.job_queue.run_repeating(matchmaking_job, interval=30, first=0)
-
     # Запуск (синхронный; сам управляет event loop'ом)
     app.run_polling(
-        allowed_updates=["message", "chat_member", "callback_query", "my_chat_member"]
+        allowed_updates=["message", "chat_member", "callback_query", "my_chat_member", "inline_query"]
     )
 
 
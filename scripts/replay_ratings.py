@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# scripts/replay_ratings.py
+#
+# Офлайн-пересчёт рейтингов по истории матчей (смена формулы, новый сезон).
+#
+#   python scripts/replay_ratings.py [--engine elo|glicko2|flat]
+#                                    [--output ratings.replayed.json]
+#                                    [--report ratings.diff.csv]
+#
+# Журнал match_log/ читается построчно: от каждого матча остаются только
+# индексы игроков в плоских массивах, без словарей на матч. Затем матчи
+# раскладываются по «волнам» — в одной волне у матчей нет общих игроков,
+# поэтому её можно посчитать одним матричным вызовом движка, а результат
+# совпадает с последовательным пересчётом в порядке времени.
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MATCH_FILE, MATCH_LOG_DIR, RATING_ENGINE, RATING_FILE  # noqa: E402
+from core.rating_engine import DEFAULTS, get_engine  # noqa: E402
+from core.storage import atomic_write  # noqa: E402
+
+
+def _segment_files() -> list[str]:
+    index_path = os.path.join(MATCH_LOG_DIR, "index.json")
+    try:
+        with open(index_path, "r") as f:
+            names = [segment["file"] for segment in json.load(f)["segments"]]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        if not os.path.isdir(MATCH_LOG_DIR):
+            return []
+        names = sorted(
+            (name for name in os.listdir(MATCH_LOG_DIR) if name.endswith(".jsonl")),
+            key=lambda name: (int(name.split(".")[0]), name),
+        )
+    return [os.path.join(MATCH_LOG_DIR, name) for name in names]
+
+
+# Быстрый разбор строки журнала в том виде, в каком её пишет core/history.py;
+# всё остальное разбирается через json.loads
+_LINE = re.compile(rb'"players": \[([\d, ]*)\], "winner": (\[[\d, ]*\]|\d+),.*"timestamp": (\d+)')
+
+
+def _from_record(record: dict) -> tuple[int, list[bytes], set[bytes]]:
+    winner = record.get("winner")
+    winners = winner if isinstance(winner, list) else [winner]
+    return (
+        int(record.get("timestamp", 0)),
+        [str(pid).encode() for pid in record.get("players", [])],
+        {str(pid).encode() for pid in winners},
+    )
+
+
+def _parse_line(line: bytes) -> tuple[int, list[bytes], set[bytes]]:
+    match = _LINE.search(line)
+    if match is None:
+        return _from_record(json.loads(line))
+    players, winner, timestamp = match.groups()
+    winners = set(winner[1:-1].split(b", ")) if winner.startswith(b"[") else {winner}
+    return int(timestamp), players.split(b", "), winners
+
+
+def _iter_matches():
+    """(время, игроки, победители) по каждому матчу; id игроков — байтовые строки."""
+    files = _segment_files()
+    if files:
+        for path in files:
+            try:
+                with open(path, "rb") as f:
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            yield _parse_line(line)
+            except FileNotFoundError:
+                continue
+        return
+
+    # Журнала ещё нет — старый matches.json (его приходится прочитать целиком)
+    try:
+        with open(MATCH_FILE, "r") as f:
+            legacy = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    for record in legacy.values():
+        yield _from_record(record)
+
+
+class History:
+    """История в плоских массивах: для матча i игроки — players[offsets[i]:offsets[i + 1]],
+    из них первые wins[i] — победители."""
+
+    def __init__(self):
+        self.uids: list[bytes] = []
+        self.timestamps = array("q")
+        self.offsets = array("q", [0])
+        self.wins = array("q")
+        self.players = array("q")
+
+
+def load_history() -> History:
+    history = History()
+    index: dict[bytes, int] = {}
+
+    for timestamp, players, winners in _iter_matches():
+        won = [pid for pid in players if pid in winners]
+        lost = [pid for pid in players if pid not in winners]
+        if not won or not lost:
+            continue
+
+        for pid in won + lost:
+            idx = index.get(pid)
+            if idx is None:
+                idx = index[pid] = len(history.uids)
+                history.uids.append(pid)
+            history.players.append(idx)
+        history.timestamps.append(timestamp)
+        history.wins.append(len(won))
+        history.offsets.append(len(history.players))
+    return history
+
+
+def schedule_waves(history: History, order: np.ndarray) -> np.ndarray:
+    """Номер волны каждого матча: на единицу больше последней волны любого его игрока."""
+    last_wave = [-1] * len(history.uids)
+    waves = [0] * len(order)
+    offsets, players = history.offsets.tolist(), history.players.tolist()
+    for i in order.tolist():
+        members = players[offsets[i]:offsets[i + 1]]
+        wave = max([last_wave[p] for p in members]) + 1
+        waves[i] = wave
+        for p in members:
+            last_wave[p] = wave
+    return np.array(waves, dtype=np.int64)
+
+
+def replay(history: History, engine) -> dict[str, np.ndarray]:
+    n_matches = len(history.timestamps)
+    state = {
+        field: np.full(len(history.uids), DEFAULTS[field], dtype=np.float64)
+        for field in engine.fields
+    }
+    state["wins"] = np.zeros(len(history.uids), dtype=np.int64)
+    state["losses"] = np.zeros(len(history.uids), dtype=np.int64)
+    if not n_matches:
+        return state
+
+    timestamps = np.frombuffer(history.timestamps, dtype=np.int64)
+    offsets = np.frombuffer(history.offsets, dtype=np.int64)
+    wins = np.frombuffer(history.wins, dtype=np.int64)
+    players = np.frombuffer(history.players, dtype=np.int64)
+    sizes = np.diff(offsets)
+
+    order = np.argsort(timestamps, kind="stable")
+    waves = schedule_waves(history, order)
+
+    # Внутри волны матчи группируются по составу команд (1v1, 5v5, ...)
+    order = np.lexsort((wins, sizes, waves))
+    keys = np.stack([waves[order], sizes[order], wins[order]], axis=1)
+    bounds = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+
+    for group in np.split(order, bounds):
+        size, team = sizes[group[0]], wins[group[0]]
+        idx = offsets[group][:, None] + np.arange(size)
+        members = players[idx]
+        win_idx, lose_idx = members[:, :team], members[:, team:]
+
+        new_win, new_lose = engine.rate(
+            {field: state[field][win_idx] for field in engine.fields},
+            {field: state[field][lose_idx] for field in engine.fields},
+        )
+        for field in engine.fields:
+            # Бот хранит рейтинг целым числом после каждого матча — повторяем это
+            rounding = np.round if field == "rating" else (lambda x: x)
+            state[field][win_idx] = rounding(new_win[field])
+            state[field][lose_idx] = rounding(new_lose[field])
+        np.add.at(state["wins"], win_idx.ravel(), 1)
+        np.add.at(state["losses"], lose_idx.ravel(), 1)
+    return state
+
+
+def snapshot(history: History, state: dict, engine) -> dict[str, dict]:
+    ratings = {}
+    for i, uid in enumerate(history.uids):
+        uid = uid.decode()
+        record = {
+            "rating": int(state["rating"][i]),
+            "wins": int(state["wins"][i]),
+            "losses": int(state["losses"][i]),
+        }
+        for field in engine.fields[1:]:
+            record[field] = float(state[field][i])
+        ratings[uid] = record
+    return ratings
+
+
+def write_report(path: str, current: dict, replayed: dict) -> list[tuple]:
+    rows = []
+    for uid in current.keys() | replayed.keys():
+        old = current.get(uid, {}).get("rating")
+        new = replayed.get(uid, {}).get("rating")
+        delta = (new if new is not None else 0) - (old if old is not None else 0)
+        rows.append((uid, old, new, delta if old is not None and new is not None else None))
+    rows.sort(key=lambda row: abs(row[3]) if row[3] is not None else float("inf"), reverse=True)
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id", "old_rating", "new_rating", "delta"])
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчёт рейтингов по истории матчей")
+    parser.add_argument("--engine", default=RATING_ENGINE, help="движок рейтинга (flat, elo, glicko2)")
+    parser.add_argument("--current", default=RATING_FILE, help="текущие рейтинги для отчёта о разнице")
+    parser.add_argument("--output", default="ratings.replayed.json", help="куда записать новые рейтинги")
+    parser.add_argument("--report", default="ratings.diff.csv", help="куда записать отчёт о разнице")
+    args = parser.parse_args()
+
+    engine = get_engine(args.engine)
+    started = time.perf_counter()
+
+    history = load_history()
+    loaded = time.perf_counter()
+    state = replay(history, engine)
+    replayed = snapshot(history, state, engine)
+    finished = time.perf_counter()
+
+    atomic_write(args.output, json.dumps(replayed, indent=4).encode())
+
+    try:
+        with open(args.current, "r") as f:
+            current = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        current = {}
+    rows = write_report(args.report, current, replayed)
+
+    changed = [row for row in rows if row[3]]
+    print(f"📜 Матчей: {len(history.timestamps)}, игроков: {len(history.uids)}")
+    print(f"⏱ Чтение: {loaded - started:.2f} с, пересчёт ({engine.name}): {finished - loaded:.2f} с")
+    print(f"💾 Рейтинги: {args.output}, отчёт: {args.report}")
+    print(f"📊 Изменился рейтинг у {len(changed)} игроков")
+    for uid, old, new, delta in changed[:10]:
+        print(f"   {uid}: {old} → {new} ({delta:+d})")
+
+
+if __name__ == "__main__":
+    main()